@@ -0,0 +1,218 @@
+import abc
+import datetime
+import json
+import logging
+import random
+import re
+import threading
+import time
+from types import SimpleNamespace
+from typing import Optional
+import google.generativeai as genai
+
+
+def estimate_tokens(text: str) -> int:
+    """Gemini 토큰 수를 대략적으로 추정합니다. (영문 약 4자, 한글 등 비ASCII 약 1.5자당 1토큰)"""
+    non_ascii = sum(1 for ch in text if ord(ch) > 127)
+    ascii_count = len(text) - non_ascii
+    return int(ascii_count / 4 + non_ascii / 1.5) + 1
+
+
+class SummarizerBackend(abc.ABC):
+    """요약 모델 호출을 감싸는 백엔드 인터페이스입니다.
+
+    generate()는 Gemini 응답처럼 .text와 .usage_metadata를 가진 객체를 반환하고,
+    429 등 실패는 예외로 전달합니다. (에러 메시지 해석과 재시도는 AISummaryBatchService가 담당)
+    """
+
+    # 요약 규칙(system_instruction)이 캐시되어 요청마다 토큰으로 계산하지 않아도 되는지 여부
+    instruction_cached = False
+    # 요약을 만드는 모델 이름 (요약 캐시 키와 ai_summary_cache.model_name에 들어가므로 백엔드마다 구분되게 지정)
+    model_name = "unknown"
+
+    @abc.abstractmethod
+    def generate(self, prompt: str, response_schema: Optional[dict] = None):
+        """프롬프트로 요약을 생성합니다. response_schema가 있으면 해당 스키마의 JSON으로 응답합니다."""
+
+    @abc.abstractmethod
+    def count_tokens(self, text: str) -> int:
+        """text의 토큰 수를 셉니다."""
+
+    def refresh(self) -> None:
+        """오래 실행되는 경우(run_daemon) 만료되는 리소스를 갱신합니다."""
+
+    def close(self) -> None:
+        """백엔드가 사용한 리소스를 정리합니다."""
+
+
+class GeminiBackend(SummarizerBackend):
+    """google-generativeai의 GenerativeModel을 사용하는 기본 백엔드입니다.
+
+    use_context_cache=True이면 요약 규칙을 Gemini 컨텍스트 캐시에 올리고 캐시를 사용하는 모델로 호출합니다.
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        model_name: str,
+        system_instruction: str,
+        use_context_cache: bool = False,
+        context_cache_ttl: int = 3600,
+    ):
+        self.logger = logging.getLogger("ai-summary-batch")
+        self.model_name = model_name
+        genai.configure(api_key=api_key)
+        self.logger.info(f"google-generativeai version = {genai.__version__}")
+        # 고정된 요약 규칙은 매 요청 프롬프트 대신 system_instruction으로 설정
+        self.model = genai.GenerativeModel(model_name, system_instruction=system_instruction)
+        self._cached_content = None
+        self._context_cache_ttl = context_cache_ttl
+        self._cache_expires_at = 0.0
+        if use_context_cache:
+            self._setup_context_cache(system_instruction, context_cache_ttl)
+
+    def _setup_context_cache(self, system_instruction: str, ttl_seconds: int) -> None:
+        """요약 규칙(system_instruction)을 Gemini 컨텍스트 캐시에 올리고 캐시를 사용하는 모델로 바꿉니다.
+
+        모델이 컨텍스트 캐싱을 지원하지 않거나 최소 토큰 수에 못 미치면 system_instruction만 사용합니다.
+        """
+        try:
+            from google.generativeai import caching
+
+            self._cached_content = caching.CachedContent.create(
+                model=f"models/{self.model_name}",
+                display_name="ai-summary-rules",
+                system_instruction=system_instruction,
+                ttl=datetime.timedelta(seconds=ttl_seconds),
+            )
+            self.model = genai.GenerativeModel.from_cached_content(cached_content=self._cached_content)
+            self._cache_expires_at = time.monotonic() + ttl_seconds
+            # 캐시된 토큰은 요청마다 다시 보내지 않음
+            self.instruction_cached = True
+            self.logger.info(f"요약 규칙 컨텍스트 캐시 사용: {self._cached_content.name}")
+        except Exception as e:
+            self._cached_content = None
+            self.logger.warning(f"컨텍스트 캐시를 사용할 수 없어 system_instruction만 사용합니다: {str(e)[:300]}")
+
+    def generate(self, prompt: str, response_schema: Optional[dict] = None):
+        if response_schema is None:
+            return self.model.generate_content(prompt)
+        return self.model.generate_content(
+            prompt,
+            generation_config={
+                "response_mime_type": "application/json",
+                "response_schema": response_schema,
+            },
+        )
+
+    def count_tokens(self, text: str) -> int:
+        return self.model.count_tokens(text).total_tokens
+
+    def refresh(self) -> None:
+        """컨텍스트 캐시의 남은 시간이 TTL의 절반보다 적으면 TTL만큼 연장합니다."""
+        if self._cached_content is None or self._cache_expires_at - time.monotonic() > self._context_cache_ttl / 2:
+            return
+        try:
+            self._cached_content.update(ttl=datetime.timedelta(seconds=self._context_cache_ttl))
+            self._cache_expires_at = time.monotonic() + self._context_cache_ttl
+        except Exception as e:
+            self.logger.warning(f"컨텍스트 캐시 연장 실패: {str(e)[:200]}")
+
+    def close(self) -> None:
+        if self._cached_content is not None:
+            try:
+                self._cached_content.delete()
+            except Exception as e:
+                self.logger.warning(f"컨텍스트 캐시 삭제 실패: {str(e)[:200]}")
+            self._cached_content = None
+
+
+class FakeBackend(SummarizerBackend):
+    """실제 할당량을 쓰지 않고 run()의 동시성/배치/재시도 동작을 부하 테스트하기 위한 가짜 백엔드입니다.
+
+    요청마다 latency초(±latency_jitter) 동안 대기한 뒤 요약을 만들어 반환합니다.
+    rate_limit_rate 비율로 "retry in Xs" 메시지를 담은 429 에러를, error_rate 비율로 일반 에러를 발생시킵니다.
+    seed를 지정하면 같은 순서의 요청에 대해 같은 결과가 나옵니다.
+    """
+
+    # 가짜 요약이 실제 모델의 요약 캐시로 재사용되지 않도록 별도 모델 이름을 사용
+    model_name = "fake"
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        latency_jitter: float = 0.0,
+        error_rate: float = 0.0,
+        rate_limit_rate: float = 0.0,
+        retry_delay: float = 1.0,
+        quota_value: Optional[int] = None,
+        seed: Optional[int] = None,
+    ):
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_delay = retry_delay
+        # 지정하면 429 메시지에 분당 할당량으로 포함되어 RateLimiter가 버킷 크기를 줄임
+        self.quota_value = quota_value
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.call_count = 0
+        self.rate_limited_count = 0
+        self.error_count = 0
+
+    def _next_outcome(self):
+        with self._lock:
+            self.call_count += 1
+            roll = self._random.random()
+            delay = max(0.0, self.latency + self._random.uniform(-self.latency_jitter, self.latency_jitter))
+            if roll < self.rate_limit_rate:
+                self.rate_limited_count += 1
+                return "429", delay
+            if roll < self.rate_limit_rate + self.error_rate:
+                self.error_count += 1
+                return "error", delay
+            return "ok", delay
+
+    def _rate_limit_error(self) -> Exception:
+        message = (
+            f"429 Resource has been exhausted (e.g. check quota). Please retry in {self.retry_delay}s. "
+            f'quota_metric: "generativelanguage.googleapis.com/generate_content_free_tier_requests" '
+            f'quota_id: "GenerateRequestsPerMinutePerProjectPerModel-FreeTier"'
+        )
+        if self.quota_value is not None:
+            message += f" quota_value: {self.quota_value}"
+        return Exception(message)
+
+    def generate(self, prompt: str, response_schema: Optional[dict] = None):
+        outcome, delay = self._next_outcome()
+        if delay:
+            time.sleep(delay)
+        if outcome == "429":
+            raise self._rate_limit_error()
+        if outcome == "error":
+            raise Exception("500 Internal error encountered. (fake backend)")
+
+        if response_schema is not None:
+            post_ids = re.findall(r'\[post_id: ([^\]]+)\]', prompt)
+            text = json.dumps(
+                [{"post_id": post_id, "summary": f"가짜 요약 ({post_id})"} for post_id in post_ids],
+                ensure_ascii=False,
+            )
+        else:
+            text = f"가짜 요약 ({len(prompt)}자)"
+
+        prompt_tokens = self.count_tokens(prompt)
+        output_tokens = self.count_tokens(text)
+        return SimpleNamespace(
+            text=text,
+            usage_metadata=SimpleNamespace(
+                prompt_token_count=prompt_tokens,
+                candidates_token_count=output_tokens,
+                cached_content_token_count=0,
+                total_token_count=prompt_tokens + output_tokens,
+            ),
+        )
+
+    def count_tokens(self, text: str) -> int:
+        return estimate_tokens(text)
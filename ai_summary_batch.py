@@ -1,6 +1,9 @@
 import os
 import logging
+import signal
+from ai_summary_backend import FakeBackend
 from ai_summary_batch_service import AISummaryBatchService
+from ai_summary_fetcher import DEFAULT_MAX_BYTES
 from config import get_db_config, setup_logging
 
 # .env 파일 지원 (있는 경우)
@@ -13,16 +16,98 @@ except ImportError:
 setup_logging()
 logger = logging.getLogger("ai-summary-batch")
 
-DB_CONFIG = get_db_config()
+# AI_SUMMARY_BACKEND=fake이면 실제 할당량을 쓰지 않는 가짜 백엔드로 실행 (부하 테스트용)
+USE_FAKE_BACKEND = os.getenv("AI_SUMMARY_BACKEND", "gemini") == "fake"
 
-# Gemini API 키는 환경변수에서 가져옵니다
+# 실행 방식: "online"(기본, 포스트별 Gemini 호출), "offline_batch"(Gemini Batch API),
+# "daemon"(종료하지 않고 새 포스트 알림을 받아 계속 요약)
+RUN_MODE = os.getenv("AI_SUMMARY_MODE", "online")
+
+if USE_FAKE_BACKEND:
+    # 가짜 요약이 운영 posts.summary에 기록되지 않도록 운영 DB 설정 대신 별도로 지정한 DB만 사용
+    FAKE_DSN = os.getenv("AI_SUMMARY_FAKE_DSN")
+    if not FAKE_DSN:
+        raise ValueError("AI_SUMMARY_BACKEND=fake는 테스트용 DB를 AI_SUMMARY_FAKE_DSN 환경변수로 지정해야 합니다.")
+    if RUN_MODE == "offline_batch":
+        raise ValueError("offline_batch 모드는 Gemini Batch API를 사용하므로 AI_SUMMARY_BACKEND=fake로 실행할 수 없습니다.")
+    DB_CONFIG = {"dsn": FAKE_DSN}
+else:
+    DB_CONFIG = get_db_config()
+
+# Gemini API 키는 환경변수에서 가져옵니다 (가짜 백엔드는 Gemini를 호출하지 않으므로 필요 없음)
 GEMINI_API_KEY = os.environ.get("GEMINI_API_KEY") or os.getenv("GEMINI_API_KEY")
-if not GEMINI_API_KEY:
+if not GEMINI_API_KEY and not USE_FAKE_BACKEND:
     raise ValueError("GEMINI_API_KEY 환경변수가 설정되지 않았습니다.")
 
+# 배치 동작 옵션 (환경변수로 조정 가능)
+SERVICE_OPTIONS = {
+    "stream_rows": os.getenv("AI_SUMMARY_STREAM_ROWS", "false").lower() == "true",
+    "itersize": int(os.getenv("AI_SUMMARY_ITERSIZE", "1000")),
+    "concurrency": int(os.getenv("AI_SUMMARY_CONCURRENCY", "1")),
+    "requests_per_minute": float(os.getenv("AI_SUMMARY_RPM")) if os.getenv("AI_SUMMARY_RPM") else None,
+    "tokens_per_minute": float(os.getenv("AI_SUMMARY_TPM")) if os.getenv("AI_SUMMARY_TPM") else None,
+    "max_quota_retries": int(os.getenv("AI_SUMMARY_MAX_QUOTA_RETRIES", "3")),
+    "max_input_tokens": int(os.getenv("AI_SUMMARY_MAX_INPUT_TOKENS", "6000")),
+    "chunk_tokens": int(os.getenv("AI_SUMMARY_CHUNK_TOKENS", "4000")),
+    "max_chunks": int(os.getenv("AI_SUMMARY_MAX_CHUNKS", "8")),
+    "use_model_token_count": os.getenv("AI_SUMMARY_USE_MODEL_TOKEN_COUNT", "false").lower() == "true",
+    "posts_per_request": int(os.getenv("AI_SUMMARY_POSTS_PER_REQUEST", "1")),
+    "batch_post_max_tokens": int(os.getenv("AI_SUMMARY_BATCH_POST_MAX_TOKENS", "1500")),
+    "use_context_cache": os.getenv("AI_SUMMARY_CONTEXT_CACHE", "false").lower() == "true",
+    "batch_poll_interval": float(os.getenv("AI_SUMMARY_BATCH_POLL_INTERVAL", "60")),
+    "write_batch_size": int(os.getenv("AI_SUMMARY_WRITE_BATCH_SIZE", "50")),
+    "write_flush_interval": float(os.getenv("AI_SUMMARY_WRITE_FLUSH_INTERVAL", "5")),
+    "claim_mode": os.getenv("AI_SUMMARY_CLAIM_MODE", "false").lower() == "true",
+    "claim_batch_size": int(os.getenv("AI_SUMMARY_CLAIM_BATCH_SIZE", "20")),
+    "lease_seconds": int(os.getenv("AI_SUMMARY_LEASE_SECONDS", "600")),
+    "use_summary_cache": os.getenv("AI_SUMMARY_CACHE", "false").lower() == "true",
+    "pool_minconn": int(os.getenv("AI_SUMMARY_POOL_MINCONN", "1")),
+    "pool_maxconn": int(os.getenv("AI_SUMMARY_POOL_MAXCONN", "4")),
+    "extract_workers": int(os.getenv("AI_SUMMARY_EXTRACT_WORKERS", "0")),
+    "extract_parser": os.getenv("AI_SUMMARY_EXTRACT_PARSER", "lxml"),
+    "http_cache_dir": os.getenv("AI_SUMMARY_HTTP_CACHE_DIR") or None,
+    "fetch_max_bytes": int(os.getenv("AI_SUMMARY_FETCH_MAX_BYTES", str(DEFAULT_MAX_BYTES))),
+    "metrics_port": int(os.getenv("AI_SUMMARY_METRICS_PORT")) if os.getenv("AI_SUMMARY_METRICS_PORT") else None,
+    "metrics_push_url": os.getenv("AI_SUMMARY_METRICS_PUSH_URL") or None,
+    "store_token_usage": os.getenv("AI_SUMMARY_STORE_TOKEN_USAGE", "false").lower() == "true",
+    "max_run_tokens": int(os.getenv("AI_SUMMARY_MAX_RUN_TOKENS")) if os.getenv("AI_SUMMARY_MAX_RUN_TOKENS") else None,
+    "max_run_cost": float(os.getenv("AI_SUMMARY_MAX_RUN_COST")) if os.getenv("AI_SUMMARY_MAX_RUN_COST") else None,
+    "input_token_price": float(os.getenv("AI_SUMMARY_INPUT_TOKEN_PRICE", "0")),
+    "output_token_price": float(os.getenv("AI_SUMMARY_OUTPUT_TOKEN_PRICE", "0")),
+    "priority_order": os.getenv("AI_SUMMARY_PRIORITY_ORDER", "post_id"),
+    "fresh_column": os.getenv("AI_SUMMARY_FRESH_COLUMN") or None,
+    "fresh_hours": float(os.getenv("AI_SUMMARY_FRESH_HOURS", "24")),
+    "backfill_limit": int(os.getenv("AI_SUMMARY_BACKFILL_LIMIT")) if os.getenv("AI_SUMMARY_BACKFILL_LIMIT") else None,
+    "daemon_channel": os.getenv("AI_SUMMARY_DAEMON_CHANNEL", "ai_summary_new_post"),
+    "daemon_poll_interval": float(os.getenv("AI_SUMMARY_DAEMON_POLL_INTERVAL", "300")),
+    "daemon_debounce": float(os.getenv("AI_SUMMARY_DAEMON_DEBOUNCE", "2")),
+    "install_notify_trigger": os.getenv("AI_SUMMARY_INSTALL_NOTIFY_TRIGGER", "false").lower() == "true",
+}
+
+if USE_FAKE_BACKEND:
+    SERVICE_OPTIONS["backend"] = FakeBackend(
+        latency=float(os.getenv("AI_SUMMARY_FAKE_LATENCY", "0.5")),
+        latency_jitter=float(os.getenv("AI_SUMMARY_FAKE_LATENCY_JITTER", "0.2")),
+        error_rate=float(os.getenv("AI_SUMMARY_FAKE_ERROR_RATE", "0")),
+        rate_limit_rate=float(os.getenv("AI_SUMMARY_FAKE_429_RATE", "0")),
+        retry_delay=float(os.getenv("AI_SUMMARY_FAKE_RETRY_DELAY", "1")),
+        seed=int(os.getenv("AI_SUMMARY_FAKE_SEED")) if os.getenv("AI_SUMMARY_FAKE_SEED") else None,
+    )
+
 if __name__ == "__main__":
     logger.info("AI 요약 배치 시작")
-    service = AISummaryBatchService(DB_CONFIG, GEMINI_API_KEY)
-    service.run()
+    service = AISummaryBatchService(DB_CONFIG, GEMINI_API_KEY, **SERVICE_OPTIONS)
+    try:
+        if RUN_MODE == "offline_batch":
+            service.run_offline_batch()
+        elif RUN_MODE == "daemon":
+            # SIGTERM/SIGINT를 받으면 진행 중인 요약까지만 반영하고 종료
+            for signum in (signal.SIGTERM, signal.SIGINT):
+                signal.signal(signum, lambda signum, frame: service.stop())
+            service.run_daemon()
+        else:
+            service.run()
+    finally:
+        service.close()
     logger.info("AI 요약 배치 완료")
 
@@ -1,28 +1,849 @@
+import asyncio
+import hashlib
 import json
+import os
+import re
+import select
+import socket
+import tempfile
+import threading
 import time
-from typing import Optional, Tuple
+from itertools import islice
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, Iterable, Optional, Tuple
 import psycopg2
+from psycopg2.extras import execute_values
+from psycopg2.pool import ThreadedConnectionPool
 import logging
-import google.generativeai as genai
 import requests
-from readability import Document
-from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+from ai_summary_backend import GeminiBackend, SummarizerBackend, estimate_tokens
+from ai_summary_fetcher import (
+    DEFAULT_MAX_BYTES,
+    FETCH_HEADERS,
+    AsyncFetcher,
+    HttpCache,
+    extract_text,
+    is_html_content_type,
+    read_capped,
+)
+from ai_summary_gemini_batch import GEMINI_API_BASE_URL, GeminiBatchClient, GeminiBatchError
+from ai_summary_metrics import Histogram, MetricsRegistry
+from ai_summary_rate_limiter import RateLimiter
+
+# summary가 NULL이고 content가 비어있지 않은 포스트만 우선순위 순서로 조회
+# {backfill_filter}와 {order_by}는 AISummaryBatchService의 우선순위 설정으로 채우고,
+# {lease_filter}는 임대 컬럼이 있을 때 다른 작업자/오프라인 배치가 임대 중인 포스트를 제외하는 조건
+PENDING_POSTS_QUERY = """
+    SELECT post_id, content, title
+    FROM posts
+    WHERE summary IS NULL
+      AND content IS NOT NULL
+      AND content != ''
+      AND TRIM(content) != ''
+      {lease_filter}
+      {backfill_filter}
+    ORDER BY {order_by}
+"""
+
+# 최신 글이 아닌(백필) 포스트는 우선순위가 높은 backfill_limit개만 대상에 포함
+BACKFILL_FILTER = """AND ({fresh} OR post_id IN (
+          SELECT post_id
+          FROM posts
+          WHERE summary IS NULL
+            AND content IS NOT NULL
+            AND content != ''
+            AND TRIM(content) != ''
+            AND NOT {fresh}
+            {extra_condition}
+          ORDER BY {order_by}
+          LIMIT %(backfill_limit)s
+      ))"""
+
+# priority_order에 사용할 수 있는 미리 정의된 정렬 기준 (posts 테이블 컬럼, 방향)
+PRIORITY_PRESETS = {
+    "post_id": [("post_id", "ASC")],
+    "recent": [("created_at", "DESC")],
+    "popular": [("view_count", "DESC")],
+}
+
+# 정렬/최신 기준 컬럼으로 허용하는 식별자 (SQL에 그대로 들어가므로 이름 형식을 검증)
+IDENTIFIER_PATTERN = re.compile(r"^[a-z_][a-z0-9_]*$")
+
+# 요약 프롬프트 공통 규칙 (모델의 system_instruction으로 설정되어 단건/다건 요약에서 함께 사용)
+SUMMARY_RULES = """당신은 IT 전문가와 개발자들을 대상으로 하는 기술 블로그 요약 전문가입니다.
+
+요약 규칙:
+- 2~3개의 짧은 문장으로 요약
+- 개발자 관점에서 기술적 핵심 내용에 집중
+- 사용된 기술 스택, 아키텍처, 구현 방법 등 실무적 정보 강조
+- 목적, 핵심 아이디어, 주요 결과를 개발자가 빠르게 파악할 수 있도록 정리
+- 불필요하게 길거나 난해한 표현 금지
+- 한 문장은 25~30자 이내로 자연스럽게
+- 마침표로 문장을 명확히 구분
+- IT 전문가와 개발자들이 실무에 적용 가능한 정보를 빠르게 이해할 수 있도록 작성"""
+
+# 여러 포스트를 한 번에 요약할 때의 응답 형식 (post_id → summary)
+BATCH_RESPONSE_SCHEMA = {
+    "type": "array",
+    "items": {
+        "type": "object",
+        "properties": {
+            "post_id": {"type": "string"},
+            "summary": {"type": "string"},
+        },
+        "required": ["post_id", "summary"],
+    },
+}
+
+# 요약 프롬프트나 규칙을 바꾸면 올려서 이전 프롬프트로 만든 캐시를 사용하지 않도록 함
+PROMPT_VERSION = "2"
+
+GEMINI_MODEL_NAME = "gemini-flash-latest"
+
+# 동일한 제목/본문에 대한 요약 캐시 (신디케이션, 크로스 포스팅된 글 재사용)
+SUMMARY_CACHE_TABLE_DDL = """
+    CREATE TABLE IF NOT EXISTS ai_summary_cache (
+        content_hash TEXT PRIMARY KEY,
+        summary TEXT NOT NULL,
+        model_name TEXT NOT NULL,
+        created_at TIMESTAMPTZ NOT NULL DEFAULT now()
+    )
+"""
+
+# 캐시 조회를 몇 개의 포스트 단위로 묶어서 할지
+CACHE_LOOKUP_CHUNK_SIZE = 50
+
+# 캐시 테이블에 반영되기 전의 최근 요약을 실행 중에 재사용할 개수
+RECENT_SUMMARY_CACHE_SIZE = 1000
+
+# 여러 프로세스/노드가 동시에 실행될 때 사용하는 작업 임대(lease) 컬럼
+CLAIM_COLUMNS = {
+    "summary_claimed_by": "TEXT",
+    "summary_claimed_at": "TIMESTAMPTZ",
+}
+
+# store_token_usage=True이면 요약과 함께 저장하는 포스트별 토큰 사용량 컬럼
+TOKEN_USAGE_COLUMNS = {
+    "summary_input_tokens": "INTEGER",
+    "summary_output_tokens": "INTEGER",
+}
+
+# 요약 모델을 호출하지 않은 경우의 (입력 토큰, 출력 토큰)
+NO_TOKEN_USAGE = (0, 0)
+
+# 포스트당 토큰 사용량 히스토그램 버킷
+POST_TOKEN_BUCKETS = (250, 500, 1000, 2000, 4000, 8000, 16000, 32000, 64000)
+
+# run_daemon()에서 posts에 요약 대상 행이 추가/변경되면 알림을 보내는 트리거
+# 알림 내용을 비워 두어 한 트랜잭션에서 여러 행을 넣어도 알림은 하나로 합쳐짐
+NOTIFY_TRIGGER_NAME = "ai_summary_notify_new_post"
+NOTIFY_FUNCTION_SQL = """
+    CREATE OR REPLACE FUNCTION ai_summary_notify_new_post() RETURNS trigger AS $$
+    BEGIN
+        PERFORM pg_notify(TG_ARGV[0], '');
+        RETURN NEW;
+    END;
+    $$ LANGUAGE plpgsql
+"""
+NOTIFY_TRIGGER_SQL = """
+    CREATE TRIGGER ai_summary_notify_new_post
+    AFTER INSERT OR UPDATE OF content ON posts
+    FOR EACH ROW
+    WHEN (NEW.summary IS NULL AND NEW.content IS NOT NULL)
+    EXECUTE PROCEDURE ai_summary_notify_new_post('{channel}')
+"""
+
+# 알림 채널 연결이 끊긴 경우 다시 연결을 시도하는 간격(초)
+LISTEN_RECONNECT_DELAY = 5.0
+
+# 아무도 점유하지 않았거나 임대 기간이 만료된 포스트를 우선순위 순서로 limit개 점유
+# SKIP LOCKED로 다른 작업자가 점유 중인 행은 기다리지 않고 건너뜀
+# (UPDATE ... RETURNING은 순서를 보장하지 않으므로 CTE로 받아서 다시 정렬)
+CLAIM_POSTS_QUERY = """
+    WITH claimed AS (
+        UPDATE posts AS p
+        SET summary_claimed_by = %(worker_id)s,
+            summary_claimed_at = now()
+        FROM (
+            SELECT post_id
+            FROM posts
+            WHERE summary IS NULL
+              AND content IS NOT NULL
+              AND content != ''
+              AND TRIM(content) != ''
+              AND {lease_condition}
+              {backfill_filter}
+            ORDER BY {order_by}
+            LIMIT %(limit)s
+            FOR UPDATE SKIP LOCKED
+        ) AS c
+        WHERE p.post_id = c.post_id
+        RETURNING p.*
+    )
+    SELECT post_id, content, title, {fresh} AS is_fresh
+    FROM claimed
+    ORDER BY {order_by}
+"""
+
+CLAIM_LEASE_CONDITION = """(summary_claimed_at IS NULL
+                   OR summary_claimed_at < now() - make_interval(secs => %(lease_seconds)s))"""
+
+# 오프라인 배치에 제출한 포스트는 summary_claimed_by에 배치 작업 이름을 기록해 임대
+# (작업 생성 전에는 작업자별 임시 이름을 사용하고, 생성 후 "batch:<작업 이름>"으로 바꿈)
+OFFLINE_CLAIM_PREFIX = "batch:"
+OFFLINE_PENDING_CLAIM_PREFIX = "batch-pending:"
+
+# 요약 대상 중 임대되지 않은 포스트를 오프라인 배치용으로 임대
+# 임대 만료 시각을 미래로 설정하여 batch_timeout 동안 run()이나 다른 작업자가 가져가지 않도록 함
+OFFLINE_CLAIM_QUERY = """
+    UPDATE posts
+    SET summary_claimed_by = %(claim_token)s,
+        summary_claimed_at = now() + make_interval(secs => %(lease_extension)s)
+    WHERE post_id IN (SELECT post_id FROM ({pending_query}) AS pending)
+      AND summary IS NULL
+      AND {lease_condition}
+"""
+
+OFFLINE_CLAIMED_POSTS_QUERY = """
+    SELECT post_id, content, title
+    FROM posts
+    WHERE summary_claimed_by = %(claim_token)s
+      AND summary IS NULL
+    ORDER BY post_id
+"""
+
+# 이전 실행에서 결과를 반영하지 못했고 임대가 아직 유효한 오프라인 배치 작업
+OFFLINE_CLAIMED_BATCHES_QUERY = """
+    SELECT DISTINCT summary_claimed_by
+    FROM posts
+    WHERE summary IS NULL
+      AND summary_claimed_by LIKE 'batch:%%'
+      AND summary_claimed_at >= now() - make_interval(secs => %(lease_seconds)s)
+"""
+
+OFFLINE_RELEASE_QUERY = """
+    UPDATE posts
+    SET summary_claimed_by = NULL,
+        summary_claimed_at = NULL
+    WHERE summary_claimed_by = %(claim_token)s
+      AND summary IS NULL
+"""
+
+
+def _parse_priority_order(priority_order: str) -> list:
+    """우선순위 설정을 (컬럼, 방향) 목록으로 바꿉니다.
+    
+    PRIORITY_PRESETS의 이름 또는 "view_count desc, created_at desc"처럼 쉼표로 구분한
+    컬럼과 방향(ASC/DESC, 생략하면 ASC)을 받습니다. 잘못된 식별자나 방향이면 ValueError가 발생합니다.
+    """
+    preset = PRIORITY_PRESETS.get(priority_order.strip().lower())
+    if preset is not None:
+        return list(preset)
+    
+    columns = []
+    for item in priority_order.split(","):
+        parts = item.strip().lower().split()
+        if not parts or len(parts) > 2:
+            raise ValueError(f"잘못된 우선순위 설정입니다: {priority_order!r}")
+        column = parts[0]
+        direction = parts[1].upper() if len(parts) == 2 else "ASC"
+        if not IDENTIFIER_PATTERN.match(column) or direction not in ("ASC", "DESC"):
+            raise ValueError(f"잘못된 우선순위 설정입니다: {item.strip()!r}")
+        columns.append((column, direction))
+    return columns
+
+
+def _order_by_sql(columns: list) -> str:
+    """(컬럼, 방향) 목록으로 ORDER BY 절을 만듭니다. 같은 순위는 post_id 순서로 처리합니다."""
+    terms = [f"{column} {direction} NULLS LAST" if direction == "DESC" else f"{column} {direction}" for column, direction in columns]
+    if "post_id" not in {column for column, _ in columns}:
+        terms.append("post_id ASC")
+    return ", ".join(terms)
+
+
+def _add_usage(*usages: Tuple[int, int]) -> Tuple[int, int]:
+    """(입력 토큰, 출력 토큰) 사용량을 더합니다."""
+    return (sum(usage[0] for usage in usages), sum(usage[1] for usage in usages))
+
+
+def _split_usage(usage: Tuple[int, int], weights: list) -> list:
+    """한 요청의 토큰 사용량을 weights 비율로 나눕니다. 나머지는 마지막 항목에 더해 합계를 유지합니다."""
+    total_weight = sum(weights)
+    if total_weight <= 0:
+        weights = [1] * len(weights)
+        total_weight = len(weights)
+    shares = [(usage[0] * weight // total_weight, usage[1] * weight // total_weight) for weight in weights]
+    input_rest = usage[0] - sum(share[0] for share in shares)
+    output_rest = usage[1] - sum(share[1] for share in shares)
+    shares[-1] = (shares[-1][0] + input_rest, shares[-1][1] + output_rest)
+    return shares
+
+
+def _split_into_chunks(text: str, chunk_tokens: int) -> list:
+    """긴 본문을 문단/문장 경계에서 chunk_tokens 이하(추정치)의 조각으로 나눕니다."""
+    segments = [seg.strip() for seg in re.split(r'\n+|(?<=[.!?。])\s+', text) if seg and seg.strip()]
+    
+    chunks = []
+    current = []
+    current_tokens = 0
+    for seg in segments:
+        seg_tokens = estimate_tokens(seg)
+        
+        # 한 문장이 너무 길면 글자 수 비율로 강제 분할
+        if seg_tokens > chunk_tokens:
+            if current:
+                chunks.append(" ".join(current))
+                current, current_tokens = [], 0
+            piece_chars = max(1, int(len(seg) * chunk_tokens / seg_tokens))
+            chunks.extend(seg[i:i + piece_chars] for i in range(0, len(seg), piece_chars))
+            continue
+        
+        if current and current_tokens + seg_tokens > chunk_tokens:
+            chunks.append(" ".join(current))
+            current, current_tokens = [], 0
+        current.append(seg)
+        current_tokens += seg_tokens
+    
+    if current:
+        chunks.append(" ".join(current))
+    return chunks
+
+
+class _RunStats:
+    """run() 한 번의 실행 동안 누적되는 처리 통계"""
+
+    def __init__(self):
+        self.success_count = 0
+        self.fail_count = 0
+        # 요약을 생성했지만 다른 작업자가 먼저 summary를 채워 반영하지 않은 건수
+        self.skipped_count = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.quota_exhausted = False
+        # max_run_tokens/max_run_cost에 도달해 새 요청을 멈췄는지 여부
+        self.budget_exhausted = False
+        # stop()으로 종료 요청을 받아 새 요청을 멈췄는지 여부
+        self.stopped = False
+
+
+class _SummaryWriter:
+    """완료된 요약을 모아서 한 번의 UPDATE ... FROM (VALUES ...)로 반영하는 쓰기 버퍼
+    
+    batch_size개가 쌓이거나 마지막 반영 후 flush_interval초가 지나면 반영하며,
+    run() 종료 시 flush()를 호출해 남은 요약을 모두 기록합니다.
+    summary가 아직 NULL인 행만 갱신하므로 다른 작업자가 먼저 채운 행은 덮어쓰지 않습니다.
+    cache_key와 함께 추가된 요약은 같은 트랜잭션에서 ai_summary_cache에도 저장합니다.
+    store_token_usage=True이면 포스트별 토큰 사용량(TOKEN_USAGE_COLUMNS)도 함께 기록합니다.
+    """
+
+    def __init__(
+        self,
+        conn,
+        stats: _RunStats,
+        logger: logging.Logger,
+        batch_size: int,
+        flush_interval: float,
+        model_name: str = GEMINI_MODEL_NAME,
+        stage_seconds: Optional[Histogram] = None,
+        store_token_usage: bool = False,
+    ):
+        self.conn = conn
+        self.stage_seconds = stage_seconds
+        self.store_token_usage = store_token_usage
+        self.model_name = model_name
+        self.stats = stats
+        self.logger = logger
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.pending = []
+        self.last_flush = time.monotonic()
+
+    def add(self, post_id, summary: str, cache_key: Optional[str] = None, usage: Tuple[int, int] = NO_TOKEN_USAGE) -> None:
+        self.pending.append((post_id, summary, cache_key, usage))
+        if len(self.pending) >= self.batch_size or time.monotonic() - self.last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self) -> None:
+        """버퍼에 쌓인 요약을 하나의 트랜잭션으로 반영합니다."""
+        self.last_flush = time.monotonic()
+        if not self.pending:
+            return
+
+        batch, self.pending = self.pending, []
+        start = time.perf_counter()
+        cur = self.conn.cursor()
+        try:
+            if self.store_token_usage:
+                updated = execute_values(
+                    cur,
+                    """
+                    UPDATE posts AS p
+                    SET summary = v.summary,
+                        summary_input_tokens = v.input_tokens::integer,
+                        summary_output_tokens = v.output_tokens::integer
+                    FROM (VALUES %s) AS v(post_id, summary, input_tokens, output_tokens)
+                    WHERE p.post_id = v.post_id
+                      AND p.summary IS NULL
+                    RETURNING p.post_id
+                    """,
+                    [(post_id, summary, usage[0], usage[1]) for post_id, summary, _, usage in batch],
+                    page_size=len(batch),
+                    fetch=True,
+                )
+            else:
+                updated = execute_values(
+                    cur,
+                    """
+                    UPDATE posts AS p
+                    SET summary = v.summary
+                    FROM (VALUES %s) AS v(post_id, summary)
+                    WHERE p.post_id = v.post_id
+                      AND p.summary IS NULL
+                    RETURNING p.post_id
+                    """,
+                    [(post_id, summary) for post_id, summary, _, _ in batch],
+                    page_size=len(batch),
+                    fetch=True,
+                )
+            
+            cache_rows = {cache_key: summary for _, summary, cache_key, _ in batch if cache_key}
+            if cache_rows:
+                execute_values(
+                    cur,
+                    """
+                    INSERT INTO ai_summary_cache (content_hash, summary, model_name)
+                    VALUES %s
+                    ON CONFLICT (content_hash) DO NOTHING
+                    """,
+                    [(cache_key, summary, self.model_name) for cache_key, summary in cache_rows.items()],
+                    page_size=len(cache_rows),
+                )
+            self.conn.commit()
+            
+            updated_ids = {row[0] for row in updated}
+            self.stats.success_count += len(updated_ids)
+            skipped_ids = [post_id for post_id, _, _, _ in batch if post_id not in updated_ids]
+            if skipped_ids:
+                self.stats.skipped_count += len(skipped_ids)
+                self.logger.info(f"summary가 이미 존재하여 반영하지 않음 (post_id={', '.join(str(post_id) for post_id in skipped_ids)})")
+            self.logger.debug(f"요약 {len(updated_ids)}건 DB 반영 완료")
+        except Exception as e:
+            self.stats.fail_count += len(batch)
+            self.conn.rollback()
+            post_ids = ", ".join(str(post_id) for post_id, _, _, _ in batch)
+            self.logger.error(f"요약 DB 반영 실패 (post_id={post_ids}): {str(e)[:500]}")
+        finally:
+            cur.close()
+            if self.stage_seconds is not None:
+                self.stage_seconds.observe(time.perf_counter() - start, stage="write")
 
 
 class AISummaryBatchService:
-    def __init__(self, db_config: dict, gemini_api_key: str):
+    def __init__(
+        self,
+        db_config: dict,
+        gemini_api_key: str,
+        backend: Optional[SummarizerBackend] = None,
+        stream_rows: bool = False,
+        itersize: int = 1000,
+        concurrency: int = 1,
+        requests_per_minute: Optional[float] = None,
+        tokens_per_minute: Optional[float] = None,
+        max_quota_retries: int = 3,
+        max_input_tokens: int = 6000,
+        chunk_tokens: int = 4000,
+        max_chunks: int = 8,
+        chunk_concurrency: int = 4,
+        use_model_token_count: bool = False,
+        posts_per_request: int = 1,
+        batch_post_max_tokens: int = 1500,
+        use_context_cache: bool = False,
+        context_cache_ttl: int = 3600,
+        batch_api_base_url: str = GEMINI_API_BASE_URL,
+        batch_poll_interval: float = 60.0,
+        batch_timeout: float = 24 * 3600.0,
+        write_batch_size: int = 50,
+        write_flush_interval: float = 5.0,
+        claim_mode: bool = False,
+        claim_batch_size: int = 20,
+        lease_seconds: int = 600,
+        worker_id: Optional[str] = None,
+        use_summary_cache: bool = False,
+        pool_minconn: int = 1,
+        pool_maxconn: int = 4,
+        http_pool_connections: int = 10,
+        http_pool_maxsize: int = 10,
+        fetch_connect_timeout: float = 5.0,
+        fetch_read_timeout: float = 20.0,
+        fetch_concurrency: int = 20,
+        fetch_per_host: int = 2,
+        extract_workers: int = 0,
+        extract_parser: str = "lxml",
+        fetch_max_chars: Optional[int] = None,
+        http_cache_dir: Optional[str] = None,
+        fetch_max_bytes: Optional[int] = DEFAULT_MAX_BYTES,
+        metrics: Optional[MetricsRegistry] = None,
+        metrics_port: Optional[int] = None,
+        metrics_push_url: Optional[str] = None,
+        store_token_usage: bool = False,
+        max_run_tokens: Optional[int] = None,
+        max_run_cost: Optional[float] = None,
+        input_token_price: float = 0.0,
+        output_token_price: float = 0.0,
+        priority_order: str = "post_id",
+        fresh_column: Optional[str] = None,
+        fresh_hours: float = 24.0,
+        backfill_limit: Optional[int] = None,
+        daemon_channel: str = "ai_summary_new_post",
+        daemon_poll_interval: float = 300.0,
+        daemon_debounce: float = 2.0,
+        install_notify_trigger: bool = False,
+    ):
         self.db_config = db_config
+        # 모든 DB 작업은 하나의 커넥션 풀을 공유 (처음 사용할 때 생성)
+        self.pool_minconn = pool_minconn
+        self.pool_maxconn = max(pool_minconn, pool_maxconn)
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        # URL 본문 수집용 HTTP 세션 (호스트별 keep-alive 커넥션 재사용)
+        self.http_pool_connections = http_pool_connections
+        self.http_pool_maxsize = http_pool_maxsize
+        self.fetch_timeout = (fetch_connect_timeout, fetch_read_timeout)
+        # fetch_urls()의 전체 동시 요청 수와 호스트당 동시 요청 수
+        self.fetch_concurrency = fetch_concurrency
+        self.fetch_per_host = fetch_per_host
+        # 본문 추출(readability/BeautifulSoup)을 실행할 프로세스 수 (0이면 현재 프로세스에서 실행)
+        self.extract_workers = extract_workers
+        self._extract_pool = None
+        # 본문 HTML에서 텍스트를 뽑을 파서 ("lxml": lxml 트리에서 바로 추출, "bs4": BeautifulSoup html.parser)
+        self.extract_parser = extract_parser
+        # 추출한 본문을 글자 수로 자를 한도 (None이면 자르지 않고 요약 단계의 토큰 예산으로 처리)
+        self.fetch_max_chars = fetch_max_chars
+        # http_cache_dir를 지정하면 ETag/Last-Modified 조건부 요청으로 변경되지 않은 페이지를 재사용
+        self.http_cache = HttpCache(http_cache_dir) if http_cache_dir else None
+        # URL 하나당 다운로드할 최대 바이트 수 (None이면 제한 없음)
+        self.fetch_max_bytes = fetch_max_bytes
+        self.http = self._build_http_session()
+        # stream_rows=True이면 서버 사이드 커서로 itersize개씩 나눠서 조회합니다 (조회 전용 커넥션을 하나 더 사용)
+        if stream_rows and self.pool_maxconn < 2:
+            raise ValueError("stream_rows=True이면 조회와 요약 반영에 커넥션이 2개 필요하므로 pool_maxconn은 2 이상이어야 합니다.")
+        self.stream_rows = stream_rows
+        self.itersize = itersize
+        # 동시에 진행할 Gemini 요약 요청 수 (1이면 기존처럼 순차 처리)
+        self.concurrency = max(1, concurrency)
+        # 모든 워커가 공유하는 RPM/TPM 제한기 (429 발생 시 대기 시간을 적응적으로 늘림)
+        self.rate_limiter = RateLimiter(requests_per_minute, tokens_per_minute)
+        self.max_quota_retries = max_quota_retries
+        # 한 번의 요청으로 요약할 본문 토큰 한도와, 넘는 경우 나눌 조각 크기/개수/동시 요청 수
+        self.max_input_tokens = max_input_tokens
+        self.chunk_tokens = min(chunk_tokens, max_input_tokens)
+        self.max_chunks = max(2, max_chunks)
+        self.use_model_token_count = use_model_token_count
+        # 본문이 batch_post_max_tokens 이하인 포스트는 posts_per_request개씩 한 요청으로 요약 (1이면 사용 안 함)
+        self.posts_per_request = max(1, posts_per_request)
+        self.batch_post_max_tokens = batch_post_max_tokens
+        self._chunk_executor = ThreadPoolExecutor(max_workers=max(1, chunk_concurrency), thread_name_prefix="ai-summary-chunk")
+        # 요약 결과는 write_batch_size건 또는 write_flush_interval초 단위로 모아서 커밋
+        self.write_batch_size = write_batch_size
+        self.write_flush_interval = write_flush_interval
+        # claim_mode=True이면 포스트를 claim_batch_size개씩 임대해 처리하므로 여러 프로세스가 동시에 실행 가능
+        self.claim_mode = claim_mode
+        self.claim_batch_size = claim_batch_size
+        self.lease_seconds = lease_seconds
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        # 같은 제목/본문이면 ai_summary_cache에 저장된 요약을 재사용하여 Gemini 호출을 생략
+        self.use_summary_cache = use_summary_cache
         self.logger = logging.getLogger("ai-summary-batch")
-        genai.configure(api_key=gemini_api_key)
-        self.logger.info(f"google-generativeai version = {genai.__version__}")
-        self.model = genai.GenerativeModel("gemini-flash-latest")
+        # run_offline_batch()에서 사용하는 Gemini Batch API 설정 (base_url을 바꾸면 로컬 스텁 사용 가능)
+        self.gemini_api_key = gemini_api_key
+        self.batch_api_base_url = batch_api_base_url
+        self.batch_poll_interval = batch_poll_interval
+        self.batch_timeout = batch_timeout
+        # 요약 모델 호출 백엔드 (지정하지 않으면 Gemini, 부하 테스트에는 FakeBackend 사용)
+        if backend is None:
+            backend = GeminiBackend(
+                gemini_api_key,
+                GEMINI_MODEL_NAME,
+                SUMMARY_RULES,
+                use_context_cache=use_context_cache,
+                context_cache_ttl=context_cache_ttl,
+            )
+        self.backend = backend
+        # 요약 캐시 키와 캐시에 기록하는 모델 이름은 실제로 요약을 만드는 백엔드를 따름
+        self.model_name = backend.model_name
+        # 요청마다 함께 전송되는 요약 규칙 토큰 수 (컨텍스트 캐시를 사용하면 0)
+        self._instruction_tokens = 0 if backend.instruction_cached else estimate_tokens(SUMMARY_RULES)
+        # 단계별 소요 시간과 처리 결과 메트릭 (metrics_port를 지정하면 /metrics로 노출, metrics_push_url이면 실행 종료 시 전송)
+        self.metrics = metrics or MetricsRegistry()
+        self._stage_seconds = self.metrics.histogram("ai_summary_stage_seconds", "AI 요약 배치 단계별 소요 시간(초)")
+        self._posts_total = self.metrics.counter("ai_summary_posts_total", "처리 결과별 포스트 수")
+        self._gemini_requests_total = self.metrics.counter("ai_summary_gemini_requests_total", "결과별 요약 모델 요청 수")
+        self._gemini_retries_total = self.metrics.counter("ai_summary_gemini_retries_total", "429 에러로 재시도한 요약 요청 수")
+        self._gemini_tokens_total = self.metrics.counter("ai_summary_gemini_tokens_total", "요약 모델이 사용한 토큰 수")
+        self._fetched_bytes_total = self.metrics.counter("ai_summary_fetched_bytes_total", "URL 본문 수집으로 내려받은 바이트 수")
+        self._post_tokens = self.metrics.histogram("ai_summary_post_tokens", "요약을 생성한 포스트당 토큰 수(입력+출력)", POST_TOKEN_BUCKETS)
+        self.metrics_push_url = metrics_push_url
+        # 토큰 사용량 기록과 실행 예산: 가격은 100만 토큰당 금액이며, 예산에 도달하면 새 요청 없이 종료
+        self.store_token_usage = store_token_usage
+        self.max_run_tokens = max_run_tokens
+        self.max_run_cost = max_run_cost
+        self.input_token_price = input_token_price
+        self.output_token_price = output_token_price
+        if max_run_cost is not None and not (input_token_price or output_token_price):
+            self.logger.warning("max_run_cost가 설정되었지만 토큰 가격이 0이어서 비용 예산이 적용되지 않습니다.")
+        # 요약 순서: priority_order 순으로 처리하며, fresh_column이 fresh_hours 이내인 최신 글을 먼저 처리하고
+        # 나머지(백필)는 backfill_limit개까지만 처리 (None이면 제한 없음)
+        self.priority_columns = _parse_priority_order(priority_order)
+        if fresh_column is not None and not IDENTIFIER_PATTERN.match(fresh_column):
+            raise ValueError(f"잘못된 fresh_column입니다: {fresh_column!r}")
+        if backfill_limit is not None and fresh_column is None:
+            raise ValueError("backfill_limit은 fresh_column과 함께 사용해야 합니다.")
+        self.fresh_column = fresh_column
+        self.backfill_limit = backfill_limit
+        self._query_params = {"fresh_seconds": fresh_hours * 3600, "backfill_limit": backfill_limit, "lease_seconds": lease_seconds}
+        self._pending_posts_query, self._unclaimed_posts_query, self._claim_posts_query = self._build_pending_queries()
+        # run_daemon() 설정: daemon_channel 알림을 받으면 daemon_debounce초 동안 알림을 모아서 실행하고,
+        # 알림이 없어도 daemon_poll_interval초마다 실행 (install_notify_trigger=True이면 알림 트리거를 생성)
+        if not IDENTIFIER_PATTERN.match(daemon_channel):
+            raise ValueError(f"잘못된 daemon_channel입니다: {daemon_channel!r}")
+        self.daemon_channel = daemon_channel
+        self.daemon_poll_interval = daemon_poll_interval
+        self.daemon_debounce = daemon_debounce
+        self.install_notify_trigger = install_notify_trigger
+        # stop()으로 설정되는 종료 요청 (시그널 핸들러에서도 호출되므로 잠금 없이 값만 바꿈)
+        self._stop_requested = False
+        self._wakeup_fd = None
+        self._metrics_server = self.metrics.start_http_server(metrics_port) if metrics_port is not None else None
+
+    def _get_pool(self) -> ThreadedConnectionPool:
+        with self._pool_lock:
+            if self._pool is None or self._pool.closed:
+                self._pool = ThreadedConnectionPool(self.pool_minconn, self.pool_maxconn, **self.db_config)
+            return self._pool
 
     def _get_conn(self):
-        return psycopg2.connect(**self.db_config)
+        return self._get_pool().getconn()
+
+    def _put_conn(self, conn) -> None:
+        """커넥션을 풀에 반환합니다. 진행 중인 트랜잭션은 풀에서 롤백되며, 끊어진 커넥션은 폐기됩니다."""
+        pool = self._pool
+        if pool is None or pool.closed:
+            conn.close()
+            return
+        pool.putconn(conn, close=bool(conn.closed))
+
+    def _build_http_session(self) -> requests.Session:
+        """keep-alive 커넥션 풀을 가진 requests 세션을 만듭니다.
+        
+        http_pool_connections는 커넥션 풀을 유지할 호스트 수, http_pool_maxsize는 호스트당 커넥션 수입니다.
+        """
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=self.http_pool_connections, pool_maxsize=self.http_pool_maxsize)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        session.headers.update(FETCH_HEADERS)
+        session.headers['Connection'] = 'keep-alive'
+        return session
+
+    def _get_extract_pool(self) -> Optional[ProcessPoolExecutor]:
+        """본문 추출용 프로세스 풀을 반환합니다. extract_workers가 0이면 None입니다."""
+        if self.extract_workers <= 0:
+            return None
+        with self._pool_lock:
+            if self._extract_pool is None:
+                self._extract_pool = ProcessPoolExecutor(max_workers=self.extract_workers)
+            return self._extract_pool
+
+    def _extract_text(self, html: bytes) -> Optional[str]:
+        """HTML 본문을 추출합니다. 프로세스 풀이 있으면 GIL에 묶이지 않도록 풀에서 실행합니다."""
+        extract_pool = self._get_extract_pool()
+        with self._stage_seconds.time(stage="extract"):
+            if extract_pool is None:
+                return extract_text(html, self.fetch_max_chars, self.extract_parser)
+            return extract_pool.submit(extract_text, html, self.fetch_max_chars, self.extract_parser).result()
+
+    def close(self) -> None:
+        """커넥션 풀의 모든 커넥션과 HTTP 세션, 조각 요약/본문 추출 풀, 요약 백엔드, 메트릭 서버를 정리합니다."""
+        self.http.close()
+        self.backend.close()
+        if self._metrics_server is not None:
+            self._metrics_server.shutdown()
+            self._metrics_server.server_close()
+            self._metrics_server = None
+        self._chunk_executor.shutdown(wait=True)
+        if self._extract_pool is not None:
+            self._extract_pool.shutdown(wait=True)
+            self._extract_pool = None
+        with self._pool_lock:
+            if self._pool is not None and not self._pool.closed:
+                self._pool.closeall()
+            self._pool = None
+
+    def _build_pending_queries(self) -> Tuple[str, str, str]:
+        """우선순위 설정으로 요약 대상 조회 쿼리, 임대 중인 포스트를 제외한 조회 쿼리, 임대 쿼리를 만듭니다."""
+        if self.fresh_column:
+            fresh = f"COALESCE({self.fresh_column} >= now() - make_interval(secs => %(fresh_seconds)s), false)"
+            order_by = f"{fresh} DESC, {_order_by_sql(self.priority_columns)}"
+        else:
+            fresh = "true"
+            order_by = _order_by_sql(self.priority_columns)
+        
+        lease_filter = f"AND {CLAIM_LEASE_CONDITION}"
+        pending_filter = claim_filter = ""
+        if self.backfill_limit is not None:
+            pending_filter = BACKFILL_FILTER.format(fresh=fresh, extra_condition="", order_by=order_by)
+            claim_filter = BACKFILL_FILTER.format(fresh=fresh, extra_condition=lease_filter, order_by=order_by)
+        
+        pending_query = PENDING_POSTS_QUERY.format(lease_filter="", backfill_filter=pending_filter, order_by=order_by)
+        unclaimed_query = PENDING_POSTS_QUERY.format(lease_filter=lease_filter, backfill_filter=claim_filter, order_by=order_by)
+        claim_query = CLAIM_POSTS_QUERY.format(
+            lease_condition=CLAIM_LEASE_CONDITION, backfill_filter=claim_filter, order_by=order_by, fresh=fresh,
+        )
+        return pending_query, unclaimed_query, claim_query
+
+    def _select_pending_query(self, conn) -> str:
+        """요약 대상 조회 쿼리를 고릅니다. 임대 컬럼이 있으면 다른 작업자나 오프라인 배치가 임대 중인 포스트는 제외합니다."""
+        claimable = set(CLAIM_COLUMNS) <= self._existing_columns(conn, "posts")
+        conn.commit()
+        return self._unclaimed_posts_query if claimable else self._pending_posts_query
+
+    def _existing_columns(self, conn, table: str) -> set:
+        """현재 스키마에서 테이블의 컬럼 이름 목록을 조회합니다."""
+        cur = conn.cursor()
+        try:
+            cur.execute(
+                "SELECT column_name FROM information_schema.columns WHERE table_name = %s AND table_schema = current_schema()",
+                (table,),
+            )
+            return {row[0] for row in cur.fetchall()}
+        finally:
+            cur.close()
+
+    def _check_priority_columns(self, conn) -> None:
+        """우선순위/최신 기준 컬럼이 posts 테이블에 있는지 확인합니다. 없으면 ValueError가 발생합니다."""
+        required = {column for column, _ in self.priority_columns}
+        if self.fresh_column:
+            required.add(self.fresh_column)
+        if required <= {"post_id"}:
+            return
+        missing = required - self._existing_columns(conn, "posts")
+        conn.commit()
+        if missing:
+            raise ValueError(f"posts 테이블에 우선순위 컬럼이 없습니다: {', '.join(sorted(missing))}")
+
+    def _ensure_columns(self, conn, table: str, columns: dict) -> None:
+        """테이블에 필요한 컬럼이 없으면 추가합니다. (이미 있으면 ALTER 없이 넘어감)"""
+        cur = conn.cursor()
+        try:
+            existing = self._existing_columns(conn, table)
+            missing = [name for name in columns if name not in existing]
+            if missing:
+                self.logger.info(f"{table} 테이블에 컬럼 추가: {', '.join(missing)}")
+                cur.execute(
+                    f"ALTER TABLE {table} "
+                    + ", ".join(f"ADD COLUMN IF NOT EXISTS {name} {columns[name]}" for name in missing)
+                )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cur.close()
+
+    def _iter_claimed_posts(self, conn):
+        """요약 대상 포스트를 claim_batch_size개씩 임대하면서 하나씩 반환합니다.
+        
+        임대는 즉시 커밋되므로 다른 프로세스는 같은 포스트를 가져가지 않으며,
+        작업자가 중단되어 lease_seconds가 지난 포스트는 다시 임대 대상이 됩니다.
+        요약에 실패한 포스트는 임대가 만료될 때까지 다른 작업자도 가져가지 않습니다.
+        backfill_limit이 있으면 이번 실행에서 임대한 백필 포스트 수를 세어 남은 개수만큼만 임대합니다.
+        """
+        attempted = set()
+        backfill_claimed = 0
+        cur = conn.cursor()
+        try:
+            while True:
+                params = {
+                    **self._query_params,
+                    "worker_id": self.worker_id,
+                    "lease_seconds": self.lease_seconds,
+                    "limit": self.claim_batch_size,
+                }
+                if self.backfill_limit is not None:
+                    params["backfill_limit"] = max(0, self.backfill_limit - backfill_claimed)
+                with self._stage_seconds.time(stage="select"):
+                    cur.execute(self._claim_posts_query, params)
+                    claimed = cur.fetchall()
+                    conn.commit()
+                
+                if not claimed:
+                    return
+                
+                # 이번 실행에서 이미 시도했다가 임대가 만료된 포스트는 다시 시도하지 않음
+                claimed = [row for row in claimed if row[0] not in attempted]
+                if not claimed:
+                    return
+                
+                backfill_claimed += sum(1 for row in claimed if not row[3])
+                self.logger.info(f"포스트 {len(claimed)}개 임대 (worker_id={self.worker_id})")
+                for row in claimed:
+                    attempted.add(row[0])
+                    yield row[:3]
+        finally:
+            cur.close()
+
+    def _summary_cache_key(self, content: str, title: Optional[str]) -> str:
+        """정규화한 제목/본문, 프롬프트 버전, 모델명으로 요약 캐시 키를 만듭니다."""
+        normalized_title = " ".join((title or "").split())
+        normalized_content = " ".join(content.split())
+        key_source = "\x1f".join([PROMPT_VERSION, self.model_name, normalized_title, normalized_content])
+        return hashlib.sha256(key_source.encode("utf-8")).hexdigest()
+
+    def _with_cached_summaries(self, conn, rows):
+        """포스트에 캐시 키와 캐시된 요약을 붙여서 반환합니다.
+        
+        캐시 조회는 CACHE_LOOKUP_CHUNK_SIZE개의 포스트마다 한 번의 쿼리로 처리합니다.
+        
+        Yields:
+            (post_id, content, title, cache_key, cached_summary)
+        """
+        if not self.use_summary_cache:
+            for post_id, content, title in rows:
+                yield (post_id, content, title, None, None)
+            return
+
+        rows = iter(rows)
+        cur = conn.cursor()
+        try:
+            while True:
+                chunk = list(islice(rows, CACHE_LOOKUP_CHUNK_SIZE))
+                if not chunk:
+                    return
+                
+                keys = [
+                    self._summary_cache_key(content, title) if content and content.strip() else None
+                    for _, content, title in chunk
+                ]
+                with self._stage_seconds.time(stage="cache_lookup"):
+                    cur.execute(
+                        "SELECT content_hash, summary FROM ai_summary_cache WHERE content_hash = ANY(%s)",
+                        ([key for key in keys if key],),
+                    )
+                    cached = dict(cur.fetchall())
+                    conn.commit()
+                
+                for (post_id, content, title), key in zip(chunk, keys):
+                    yield (post_id, content, title, key, cached.get(key))
+        finally:
+            cur.close()
 
     def _fetch_url_content(self, url: str) -> Tuple[Optional[str], Optional[int]]:
         """URL에서 페이지 본문 내용을 가져옵니다. readability-lxml을 사용하여 깔끔하게 추출합니다.
         
+        http_cache가 있으면 조건부 요청을 보내고, 304 응답이면 캐시된 본문을 반환합니다.
+        
         Returns:
             Tuple[Optional[str], Optional[int]]: 
                 - (content, None): 성공
@@ -30,30 +851,37 @@ class AISummaryBatchService:
                 - (None, 404): 404 에러 발생
         """
         try:
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-            }
-            response = requests.get(url, headers=headers, timeout=30)
-            response.raise_for_status()
-            
-            # readability-lxml을 사용하여 본문 추출
-            doc = Document(response.content)
-            content_html = doc.summary()
+            cached = self.http_cache.load(url) if self.http_cache else None
             
-            # HTML에서 텍스트만 추출
-            soup = BeautifulSoup(content_html, 'html.parser')
-            content = soup.get_text(separator=' ', strip=True)
+            # 연결/읽기 타임아웃을 나눠서 적용, 본문은 헤더 확인 후 필요한 만큼만 스트리밍으로 읽음
+            with self._stage_seconds.time(stage="fetch"), \
+                    self.http.get(url, headers=HttpCache.conditional_headers(cached), timeout=self.fetch_timeout, stream=True) as response:
+                # 변경되지 않은 페이지는 다시 파싱하지 않고 저장된 본문을 사용
+                if response.status_code == 304 and cached:
+                    return (cached["content"], None)
+                response.raise_for_status()
+                
+                # PDF, 동영상 등 HTML이 아닌 응답은 본문을 읽지 않음
+                content_type = response.headers.get("Content-Type")
+                if not is_html_content_type(content_type):
+                    self.logger.warning(f"HTML이 아닌 URL 건너뜀 ({url}): {content_type}")
+                    return (None, None)
+                
+                body = read_capped(response, self.fetch_max_bytes)
+                self._fetched_bytes_total.inc(len(body))
+                etag = response.headers.get("ETag")
+                last_modified = response.headers.get("Last-Modified")
             
+            content = self._extract_text(body)
             if content:
-                # 공백 정리 및 길이 제한 (너무 긴 경우)
-                content = ' '.join(content.split())
-                if len(content) > 10000:
-                    content = content[:10000] + "..."
+                if self.http_cache:
+                    self.http_cache.store(url, etag, last_modified, content)
                 return (content, None)
             
             return (None, None)
         except requests.exceptions.HTTPError as e:
-            if e.response and e.response.status_code == 404:
+            # 4xx 응답 객체는 bool 값이 False이므로 None과 비교
+            if e.response is not None and e.response.status_code == 404:
                 self.logger.warning(f"URL 404 에러 ({url}): 페이지를 찾을 수 없습니다.")
                 return (None, 404)
             else:
@@ -63,198 +891,1156 @@ class AISummaryBatchService:
             self.logger.error(f"URL 내용 가져오기 실패 ({url}): {str(e)[:200]}")
             return (None, None)
 
-    def _gemini_summarize(self, content: str, title: Optional[str] = None) -> Tuple[Optional[str], Optional[float]]:
-        """Gemini API를 사용하여 콘텐츠를 요약합니다.
+    def fetch_urls(self, urls: Iterable[str]) -> Dict[str, Tuple[Optional[str], Optional[int]]]:
+        """여러 URL의 본문을 비동기로 동시에 가져옵니다.
+        
+        전체 동시 요청 수는 fetch_concurrency, 호스트당 동시 요청 수는 fetch_per_host로 제한합니다.
         
         Returns:
-            Tuple[Optional[str], Optional[float]]: 
-                - (summary, None): 성공
-                - (None, None): 실패
-                - (None, retry_delay): 429 에러로 재시도 필요 (retry_delay 초 후 재시도)
+            Dict[str, Tuple[Optional[str], Optional[int]]]: URL별 _fetch_url_content와 같은 형식의 결과
         """
+        fetcher = AsyncFetcher(
+            concurrency=self.fetch_concurrency,
+            per_host=self.fetch_per_host,
+            connect_timeout=self.fetch_timeout[0],
+            read_timeout=self.fetch_timeout[1],
+            max_chars=self.fetch_max_chars,
+            extract_executor=self._get_extract_pool(),
+            extract_parser=self.extract_parser,
+            http_cache=self.http_cache,
+            max_bytes=self.fetch_max_bytes,
+        )
+        results = asyncio.run(fetcher.fetch_all(urls))
+        self._fetched_bytes_total.inc(fetcher.bytes_fetched)
+        return results
+
+    def _build_summary_prompt(self, content: str, title: Optional[str] = None) -> str:
+        """단건 요약 요청 프롬프트를 만듭니다. 요약 규칙은 system_instruction으로 전달되므로 글만 포함합니다."""
         # 제목이 있으면 프롬프트에 포함
         prompt_content = content
         if title:
             prompt_content = f"제목: {title}\n\n내용: {content}"
 
-        prompt = f"""당신은 IT 전문가와 개발자들을 대상으로 하는 기술 블로그 요약 전문가입니다.
+        return f"""아래 글을 개발자 관점에서 요약해주세요:
 
-요약 규칙:
-- 2~3개의 짧은 문장으로 요약
-- 개발자 관점에서 기술적 핵심 내용에 집중
-- 사용된 기술 스택, 아키텍처, 구현 방법 등 실무적 정보 강조
-- 목적, 핵심 아이디어, 주요 결과를 개발자가 빠르게 파악할 수 있도록 정리
-- 불필요하게 길거나 난해한 표현 금지
-- 한 문장은 25~30자 이내로 자연스럽게
-- 마침표로 문장을 명확히 구분
-- IT 전문가와 개발자들이 실무에 적용 가능한 정보를 빠르게 이해할 수 있도록 작성
+{prompt_content}"""
 
-아래 글을 개발자 관점에서 요약해주세요:
+    def _gemini_summarize(self, content: str, title: Optional[str] = None) -> Tuple[Optional[str], Optional[float], Tuple[int, int]]:
+        """Gemini API를 사용하여 콘텐츠를 요약합니다.
+        
+        Returns:
+            Tuple[Optional[str], Optional[float], Tuple[int, int]]: 
+                - (summary, None, usage): 성공
+                - (None, None, usage): 실패
+                - (None, retry_delay, usage): 429 에러로 재시도 필요 (retry_delay 초 후 재시도)
+                usage는 응답의 (입력 토큰, 출력 토큰)이며 응답을 받지 못했으면 (0, 0)
+        """
+        prompt = self._build_summary_prompt(content, title)
 
-{prompt_content}"""
+        # 요청 전에 RPM/TPM 한도에 맞춰 대기
+        self._observe_rate_limit_wait(self.rate_limiter.acquire(estimate_tokens(prompt) + self._instruction_tokens))
+        # 대기 중에 종료 요청을 받았으면 요청하지 않음
+        if self.rate_limiter.stopped:
+            return (None, None, NO_TOKEN_USAGE)
 
         try:
-            response = self.model.generate_content(prompt)
+            with self._stage_seconds.time(stage="summarize"):
+                response = self.backend.generate(prompt)
             
             # 성공한 경우
+            self.rate_limiter.on_success()
+            usage = self._record_gemini_success(response)
             summary = response.text.strip()
-            return (summary, None)
+            return (summary, None, usage)
             
         except Exception as e:
-            error_str = str(e)
+            return (None, self._handle_gemini_error(e), NO_TOKEN_USAGE)
+
+    def _observe_rate_limit_wait(self, waited: float) -> None:
+        """RPM/TPM 제한으로 대기한 시간을 기록합니다."""
+        if waited > 0:
+            self._stage_seconds.observe(waited, stage="rate_limit_wait")
+
+    def _record_gemini_success(self, response) -> Tuple[int, int]:
+        """성공한 요약 요청 수와 응답의 usage_metadata 토큰 수를 기록합니다.
+        
+        Returns:
+            Tuple[int, int]: (입력 토큰, 출력 토큰)
+        """
+        self._gemini_requests_total.inc(result="success")
+        usage = getattr(response, "usage_metadata", None)
+        if usage is None:
+            return NO_TOKEN_USAGE
+        prompt_tokens = getattr(usage, "prompt_token_count", 0) or 0
+        output_tokens = getattr(usage, "candidates_token_count", 0) or 0
+        if prompt_tokens:
+            self._gemini_tokens_total.inc(prompt_tokens, type="prompt")
+        if output_tokens:
+            self._gemini_tokens_total.inc(output_tokens, type="output")
+        return (prompt_tokens, output_tokens)
+
+    def _handle_gemini_error(self, e: Exception) -> Optional[float]:
+        """Gemini 호출 에러를 기록하고, 429 에러이면 재시도까지 기다릴 시간을 반환합니다.
+        
+        Returns:
+            Optional[float]: 429 에러이면 retry_delay(초), 그 밖의 에러이면 None
+        """
+        error_str = str(e)
+        
+        # 429 에러 (Quota exceeded)인 경우 재시도 지시 반환
+        if "429" in error_str or "quota" in error_str.lower() or "rate limit" in error_str.lower():
+            # 에러 메시지에서 retry_delay 추출 시도
+            retry_delay = 60  # 기본값 60초
+            quota_metric = None
+            quota_limit = None
+            quota_id = None
             
-            # 429 에러 (Quota exceeded)인 경우 재시도 지시 반환
-            if "429" in error_str or "quota" in error_str.lower() or "rate limit" in error_str.lower():
-                # 에러 메시지에서 retry_delay 추출 시도
-                retry_delay = 60  # 기본값 60초
-                quota_metric = None
-                quota_limit = None
-                
-                if "retry in" in error_str.lower():
-                    try:
-                        import re
-                        match = re.search(r'retry in ([\d.]+)s', error_str.lower())
-                        if match:
-                            retry_delay = float(match.group(1)) + 1
-                    except:
-                        pass
-                
-                # 할당량 정보 추출
+            if "retry in" in error_str.lower():
                 try:
-                    import re
-                    metric_match = re.search(r'quota_metric[:\s]+"([^"]+)"', error_str)
-                    if metric_match:
-                        quota_metric = metric_match.group(1)
-                    
-                    limit_match = re.search(r'quota_value[:\s]+(\d+)', error_str)
-                    if limit_match:
-                        quota_limit = limit_match.group(1)
+                    match = re.search(r'retry in ([\d.]+)s', error_str.lower())
+                    if match:
+                        retry_delay = float(match.group(1)) + 1
                 except:
                     pass
+            
+            # 할당량 정보 추출
+            try:
+                metric_match = re.search(r'quota_metric[:\s]+"([^"]+)"', error_str)
+                if metric_match:
+                    quota_metric = metric_match.group(1)
                 
-                # 필요한 정보만 로그 기록
-                log_parts = [f"429 에러 발생 (Quota exceeded), 재시도 대기: {retry_delay:.1f}초"]
-                if quota_metric:
-                    log_parts.append(f"할당량 메트릭: {quota_metric}")
-                if quota_limit:
-                    log_parts.append(f"할당량 제한: {quota_limit}")
+                limit_match = re.search(r'quota_value[:\s]+(\d+)', error_str)
+                if limit_match:
+                    quota_limit = limit_match.group(1)
                 
-                self.logger.warning(" - ".join(log_parts))
-                return (None, retry_delay)
-            else:
-                # 429가 아닌 다른 에러는 즉시 실패 반환
-                self.logger.error(f"Gemini 요약 생성 실패: {error_str[:500]}")
-                return (None, None)
+                id_match = re.search(r'quota_id[:\s]+"([^"]+)"', error_str)
+                if id_match:
+                    quota_id = id_match.group(1)
+            except:
+                pass
+            
+            # 필요한 정보만 로그 기록
+            log_parts = [f"429 에러 발생 (Quota exceeded), 재시도 대기: {retry_delay:.1f}초"]
+            if quota_metric:
+                log_parts.append(f"할당량 메트릭: {quota_metric}")
+            if quota_limit:
+                log_parts.append(f"할당량 제한: {quota_limit}")
+            
+            self.logger.warning(" - ".join(log_parts))
+            self._gemini_requests_total.inc(result="rate_limited")
+            
+            # 다른 워커의 요청도 함께 멈추도록 제한기에 반영
+            return self.rate_limiter.on_rate_limited(retry_delay, quota_metric, quota_limit, quota_id)
+        
+        # 429가 아닌 다른 에러는 즉시 실패 반환
+        self._gemini_requests_total.inc(result="error")
+        self.logger.error(f"Gemini 요약 생성 실패: {error_str[:500]}")
+        return None
+
+    def _gemini_summarize_batch(self, posts: list) -> Tuple[Dict[str, str], Optional[float], Tuple[int, int]]:
+        """여러 포스트를 한 번의 Gemini 요청으로 요약합니다. 응답은 JSON 스키마로 받아 검증합니다.
+        
+        Args:
+            posts: (post_id, content, title) 목록
+        
+        Returns:
+            Tuple[Dict[str, str], Optional[float], Tuple[int, int]]: 
+                - (str(post_id)별 summary, None, usage): 응답에 포함되어 검증을 통과한 요약만 담김
+                - ({}, retry_delay, usage): 429 에러로 재시도 필요
+                usage는 요청 전체의 (입력 토큰, 출력 토큰)
+        """
+        post_blocks = []
+        for post_id, content, title in posts:
+            block = f"[post_id: {post_id}]\n"
+            if title:
+                block += f"제목: {title}\n"
+            block += f"내용: {content}"
+            post_blocks.append(block)
+        
+        prompt = f"""아래 {len(posts)}개의 글을 각각 개발자 관점에서 요약해주세요.
+각 글은 [post_id: ...]로 시작합니다.
+모든 글에 대해 post_id와 summary를 가진 JSON 배열로만 응답하세요.
+
+""" + "\n\n".join(post_blocks)
+        
+        # 요청 전에 RPM/TPM 한도에 맞춰 대기
+        self._observe_rate_limit_wait(self.rate_limiter.acquire(estimate_tokens(prompt) + self._instruction_tokens))
+        if self.rate_limiter.stopped:
+            return ({}, None, NO_TOKEN_USAGE)
+        
+        usage = NO_TOKEN_USAGE
+        try:
+            with self._stage_seconds.time(stage="summarize_batch"):
+                response = self.backend.generate(prompt, response_schema=BATCH_RESPONSE_SCHEMA)
+            self.rate_limiter.on_success()
+            usage = self._record_gemini_success(response)
+            items = json.loads(response.text)
+        except ValueError as e:
+            self.logger.error(f"Gemini 다건 요약 응답 파싱 실패: {str(e)[:200]}")
+            return ({}, None, usage)
+        except Exception as e:
+            return ({}, self._handle_gemini_error(e), usage)
+        
+        # 요청한 post_id이고 summary가 비어있지 않은 항목만 사용
+        requested = {str(post_id) for post_id, _, _ in posts}
+        summaries = {}
+        if isinstance(items, list):
+            for item in items:
+                if not isinstance(item, dict):
+                    continue
+                post_id = str(item.get("post_id", "")).strip()
+                summary = item.get("summary")
+                if post_id in requested and post_id not in summaries and isinstance(summary, str) and summary.strip():
+                    summaries[post_id] = summary.strip()
+        return (summaries, None, usage)
+
+    def _summarize_post_group(self, group: list) -> None:
+        """여러 포스트를 한 요청으로 요약하고 포스트별 Future에 결과를 채웁니다. 워커 스레드에서 실행됩니다.
+        
+        응답에서 빠지거나 검증에 실패한 포스트는 단건 요약으로 대체합니다.
+        묶음 요청의 토큰 사용량은 포스트별 본문 길이(추정 토큰) 비율로 나눠 기록합니다.
+        
+        Args:
+            group: (post_id, content, title, progress, future) 목록
+        """
+        try:
+            if len(group) == 1:
+                post_id, content, title, progress, future = group[0]
+                future.set_result(self._summarize_with_retry(content, title, progress, post_id))
+                return
+            
+            posts = [(post_id, content, title) for post_id, content, title, _, _ in group]
+            summaries = {}
+            quota_exhausted = False
+            group_usage = NO_TOKEN_USAGE
+            for attempt in range(self.max_quota_retries + 1):
+                summaries, retry_delay, usage = self._gemini_summarize_batch(posts)
+                group_usage = _add_usage(group_usage, usage)
+                # 종료 요청으로 요청하지 않은 묶음은 할당량 초과와 같이 다음 실행으로 넘김
+                if not summaries and self.rate_limiter.stopped:
+                    quota_exhausted = True
+                    break
+                if retry_delay is None:
+                    break
+                if self.rate_limiter.daily_quota_exhausted or attempt == self.max_quota_retries:
+                    quota_exhausted = True
+                    break
+                self._gemini_retries_total.inc()
+            
+            missing = len(group) - len(summaries)
+            if missing and not quota_exhausted:
+                self.logger.warning(f"다건 요약 응답에서 {missing}개 포스트가 빠져 단건 요약으로 처리")
+            
+            usage_shares = _split_usage(group_usage, [estimate_tokens(content) for _, content, _ in posts])
+            for (post_id, content, title, progress, future), usage in zip(group, usage_shares):
+                if str(post_id) in summaries:
+                    future.set_result((summaries[str(post_id)], False, usage))
+                elif quota_exhausted:
+                    future.set_result((None, True, usage))
+                else:
+                    summary, post_quota_exhausted, single_usage = self._summarize_with_retry(content, title, progress, post_id)
+                    future.set_result((summary, post_quota_exhausted, _add_usage(usage, single_usage)))
+        except Exception as e:
+            self.logger.error(f"다건 요약 실패: {str(e)[:500]}")
+            for _, _, _, _, future in group:
+                if not future.done():
+                    future.set_result((None, False, NO_TOKEN_USAGE))
+
+    def _submit_post_group(self, executor: ThreadPoolExecutor, group: list) -> None:
+        """모아둔 포스트 묶음을 워커에 제출하고 비웁니다."""
+        if group:
+            executor.submit(self._summarize_post_group, list(group))
+            group.clear()
+
+    def _count_tokens(self, text: str) -> int:
+        """본문의 토큰 수를 셉니다. use_model_token_count=True이면 백엔드(Gemini count_tokens)로 셉니다."""
+        if self.use_model_token_count:
+            try:
+                return self.backend.count_tokens(text)
+            except Exception as e:
+                self.logger.warning(f"토큰 수 계산 실패, 추정치 사용: {str(e)[:200]}")
+        return estimate_tokens(text)
+
+    def _summarize_with_retry(self, content: str, title: Optional[str], progress: str, post_id) -> Tuple[Optional[str], bool, Tuple[int, int]]:
+        """토큰 예산에 맞춰 요약을 생성합니다. 워커 스레드에서 실행됩니다.
+        
+        본문이 max_input_tokens 이하이면 한 번에 요약하고, 넘으면 chunk_tokens 단위로 나눠
+        각 조각을 병렬로 요약(map)한 뒤 부분 요약들을 다시 하나로 요약(reduce)합니다.
+        조각이 max_chunks개를 넘으면 앞부분과 마지막 조각(결론)만 사용해 비용 상한을 지킵니다.
+        
+        Returns:
+            Tuple[Optional[str], bool, Tuple[int, int]]: _gemini_summarize_with_retry와 같은 형식 (usage는 조각 요약을 모두 합친 값)
+        """
+        if self._count_tokens(content) <= self.max_input_tokens:
+            return self._gemini_summarize_with_retry(content, title, progress, post_id)
+        
+        chunks = _split_into_chunks(content, self.chunk_tokens)
+        if len(chunks) > self.max_chunks:
+            chunks = chunks[:self.max_chunks - 1] + chunks[-1:]
+        self.logger.info(f"[{progress}] post_id={post_id}: 긴 글을 {len(chunks)}개 조각으로 나눠 요약")
+        
+        futures = [
+            self._chunk_executor.submit(
+                self._gemini_summarize_with_retry,
+                f"(전체 {len(chunks)}개 중 {i}번째 부분)\n{chunk}",
+                title,
+                progress,
+                post_id,
+            )
+            for i, chunk in enumerate(chunks, 1)
+        ]
+        results = [future.result() for future in futures]
+        chunk_usage = _add_usage(*(usage for _, _, usage in results))
+        
+        if any(quota_exhausted for _, quota_exhausted, _ in results):
+            return (None, True, chunk_usage)
+        if any(summary is None for summary, _, _ in results):
+            return (None, False, chunk_usage)
+        
+        partial_summaries = "\n".join(f"[{i}] {summary}" for i, (summary, _, _) in enumerate(results, 1))
+        merged_content = f"다음은 긴 글을 {len(chunks)}개 부분으로 나눠 각각 요약한 내용입니다. 전체 글의 요약으로 합쳐주세요.\n\n{partial_summaries}"
+        summary, quota_exhausted, merge_usage = self._gemini_summarize_with_retry(merged_content, title, progress, post_id)
+        return (summary, quota_exhausted, _add_usage(chunk_usage, merge_usage))
+
+    def _gemini_summarize_with_retry(self, content: str, title: Optional[str], progress: str, post_id) -> Tuple[Optional[str], bool, Tuple[int, int]]:
+        """429 에러 재시도를 포함하여 요약을 생성합니다.
+        
+        429 에러 시 고정 대기 대신 공유 rate_limiter가 retry 지연을 반영해 다음 요청을 늦추며,
+        max_quota_retries번 재시도 후에도 429이면 할당량 제한으로 판단합니다.
+        
+        Returns:
+            Tuple[Optional[str], bool, Tuple[int, int]]: 
+                - (summary, False, usage): 성공
+                - (None, False, usage): 실패
+                - (None, True, usage): 재시도 후에도 429 에러 또는 일일 할당량 초과 (할당량 제한),
+                  또는 종료 요청으로 요청하지 않음
+                usage는 모든 시도의 (입력 토큰, 출력 토큰) 합계
+        """
+        total_usage = NO_TOKEN_USAGE
+        for attempt in range(self.max_quota_retries + 1):
+            summary, retry_delay, usage = self._gemini_summarize(content, title)
+            total_usage = _add_usage(total_usage, usage)
+            
+            # 종료 요청으로 요청하지 않았거나 재시도를 멈춘 경우 실패로 세지 않고 다음 실행으로 넘김
+            if summary is None and self.rate_limiter.stopped:
+                return (None, True, total_usage)
+            
+            # 성공했거나 429가 아닌 에러는 재시도하지 않음
+            if summary is not None or retry_delay is None:
+                return (summary, False, total_usage)
+            
+            # 일일 할당량 초과는 기다려도 회복되지 않으므로 즉시 종료
+            if self.rate_limiter.daily_quota_exhausted:
+                return (None, True, total_usage)
+            
+            # 대기는 다음 요청 전 rate_limiter.acquire()에서 처리됨
+            if attempt < self.max_quota_retries:
+                self._gemini_retries_total.inc()
+                self.logger.info(f"[{progress}] post_id={post_id}: 429 에러 발생, {retry_delay:.1f}초 후 재시도 ({attempt + 1}/{self.max_quota_retries})...")
+        
+        return (None, True, total_usage)
+
+    def _apply_summary_result(self, writer: _SummaryWriter, stats: _RunStats, progress: str, post_id, future: Future, cache_key: Optional[str] = None) -> None:
+        """워커가 생성한 요약 결과를 쓰기 버퍼에 넣고 실행 통계를 갱신합니다.
+        
+        cache_key가 있으면 새로 생성한 요약으로 보고 요약 캐시에도 저장합니다.
+        """
+        # 실행이 중단되어 요청하지 않은 포스트는 실패로 세지 않고 다음 실행으로 넘김
+        if future.cancelled():
+            return
+        try:
+            summary, quota_exhausted, usage = future.result()
+            if usage != NO_TOKEN_USAGE:
+                self._post_tokens.observe(usage[0] + usage[1])
+            
+            # 재시도 후에도 429 에러가 발생하면 할당량 제한으로 판단하고 스크립트 종료
+            # (실행 예산 도달이나 종료 요청으로 제출하지 않은 요청도 같은 결과로 전달되므로 할당량 초과로 보지 않음)
+            if quota_exhausted:
+                if self._stop_requested:
+                    stats.stopped = True
+                if stats.budget_exhausted or stats.stopped:
+                    return
+                if not stats.quota_exhausted:
+                    self.logger.error(f"[{progress}] post_id={post_id}: 재시도 후에도 429 에러 발생. 할당량 제한으로 판단하여 스크립트를 종료합니다.")
+                stats.quota_exhausted = True
+                return
+            
+            # 요약 생성 실패 시 건너뛰기
+            if summary is None:
+                stats.fail_count += 1
+                self.logger.warning(f"[{progress}] post_id={post_id}: 요약 생성 실패로 건너뜀")
+                return
+            
+            # DB 업데이트 (성공 건수는 버퍼가 반영될 때 집계됨)
+            writer.add(post_id, summary, cache_key, usage)
+            self.logger.debug(f"요약 완료: {summary[:100]}...")
+            
+        except Exception as e:
+            stats.fail_count += 1
+            error_msg = str(e)[:500]
+            self.logger.error(f"[{progress}] post_id={post_id} 요약 실패: {error_msg}")
+
+    def _apply_next_result(self, writer: _SummaryWriter, stats: _RunStats, in_flight: deque, in_flight_by_key: dict, recent_summaries: OrderedDict) -> None:
+        """가장 먼저 제출한 요약 결과를 반영합니다. 새로 생성한 요약은 recent_summaries에도 보관합니다."""
+        progress, post_id, future, cache_key = in_flight.popleft()
+        if cache_key is not None and in_flight_by_key.get(cache_key) is future:
+            del in_flight_by_key[cache_key]
+        # 종료 요청 후에는 기다리는 동안 강제 종료되어도 이미 생성한 요약을 잃지 않도록 먼저 반영
+        if self._stop_requested and not future.done():
+            writer.flush()
+        self._apply_summary_result(writer, stats, progress, post_id, future, cache_key)
+        
+        if cache_key is not None and future.done() and not future.cancelled() and future.exception() is None:
+            summary = future.result()[0]
+            if summary is not None:
+                recent_summaries[cache_key] = summary
+                if len(recent_summaries) > RECENT_SUMMARY_CACHE_SIZE:
+                    recent_summaries.popitem(last=False)
+
+    def _ensure_summary_cache_table(self, conn) -> None:
+        """요약 캐시 테이블이 없으면 생성합니다."""
+        cur = conn.cursor()
+        try:
+            cur.execute(SUMMARY_CACHE_TABLE_DDL)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cur.close()
 
-    def run(self) -> None:
-        """summary가 NULL인 포스트들을 찾아서 AI 요약을 생성하고 업데이트합니다."""
+    def run(self) -> str:
+        """summary가 NULL인 포스트들을 찾아서 AI 요약을 생성하고 업데이트합니다.
+        
+        Returns:
+            str: 종료 사유 ("completed", "quota_exhausted", "budget_exhausted", "shutdown")
+        """
         start_time = time.time()
+        metrics_snapshot = self._metrics_snapshot()
         self.logger.info("AI 요약 배치 시작")
+        # 이전 실행(run_daemon)에서 일일 할당량을 초과했더라도 이번 실행에서는 429를 다시 재시도
+        self.rate_limiter.reset_run_state()
 
         conn = self._get_conn()
         cur = conn.cursor()
+        row_source = None
+        read_conn = None
+        # 실패하거나 중간에 멈춘 경우에도 그때까지의 처리 결과를 배치 로그에 남김
+        stats = _RunStats()
+        total_count = None
+        processed_count = 0
         
         try:
-            # summary가 NULL이고 content가 비어있지 않은 포스트만 조회
-            cur.execute(
-                """
-                SELECT post_id, content, title
-                FROM posts
-                WHERE summary IS NULL
-                  AND content IS NOT NULL
-                  AND content != ''
-                  AND TRIM(content) != ''
-                ORDER BY post_id ASC
-                """
-            )
-            rows = cur.fetchall()
-            total_count = len(rows)
-            
-            if total_count == 0:
-                self.logger.info("요약할 포스트가 없습니다.")
-                return
+            if self.use_summary_cache:
+                self._ensure_summary_cache_table(conn)
+            if self.store_token_usage:
+                self._ensure_columns(conn, "posts", TOKEN_USAGE_COLUMNS)
+            self._check_priority_columns(conn)
 
-            self.logger.info(f"요약 대상 포스트 {total_count}개 발견")
+            if self.claim_mode:
+                self._ensure_columns(conn, "posts", CLAIM_COLUMNS)
+                row_source = rows = self._iter_claimed_posts(conn)
+                total_count = None
+                self.logger.info(f"요약 대상 포스트 임대 방식 처리 시작 (worker_id={self.worker_id}, 임대 단위={self.claim_batch_size})")
+            elif self.stream_rows:
+                pending_query = self._select_pending_query(conn)
+                # named 커서는 서버에서 itersize개씩 가져오므로 전체 content를 메모리에 올리지 않음
+                # 요약 반영은 conn에서 커밋하고, 조회는 별도 커넥션의 트랜잭션 안에서 끝까지 읽음
+                # (WITH HOLD 커서는 commit 시점에 결과 전체를 서버에 복사하므로 사용하지 않음)
+                read_conn = self._get_conn()
+                row_source = read_conn.cursor(name="ai_summary_pending_posts")
+                row_source.itersize = self.itersize
+                with self._stage_seconds.time(stage="select"):
+                    row_source.execute(pending_query, self._query_params)
+                rows = row_source
+                total_count = None
+                self.logger.info(f"요약 대상 포스트 스트리밍 조회 시작 (itersize={self.itersize})")
+            else:
+                pending_query = self._select_pending_query(conn)
+                with self._stage_seconds.time(stage="select"):
+                    cur.execute(pending_query, self._query_params)
+                    rows = cur.fetchall()
+                total_count = len(rows)
+                
+                if total_count == 0:
+                    self.logger.info("요약할 포스트가 없습니다.")
+                    return "completed"
 
-            success_count = 0
-            fail_count = 0
+                self.logger.info(f"요약 대상 포스트 {total_count}개 발견")
 
-            for idx, (post_id, content, title) in enumerate(rows, 1):
-                try:
-                    # content가 None이거나 빈 문자열인 경우 건너뛰기 (이중 체크)
-                    if not content or not content.strip():
-                        self.logger.warning(f"[{idx}/{total_count}] post_id={post_id}: content가 비어있어 건너뜀")
-                        continue
+            writer = _SummaryWriter(conn, stats, self.logger, self.write_batch_size, self.write_flush_interval, self.model_name, self._stage_seconds, self.store_token_usage)
 
-                    # summary가 이미 있는지 확인 (이중 체크)
-                    cur.execute("SELECT summary FROM posts WHERE post_id = %s", (post_id,))
-                    existing_summary = cur.fetchone()
-                    if existing_summary and existing_summary[0] is not None:
-                        self.logger.info(f"[{idx}/{total_count}] post_id={post_id}: summary가 이미 존재하여 건너뜀")
-                        continue
-                    
-                    self.logger.info(f"[{idx}/{total_count}] post_id={post_id} 요약 생성 중...")
-                    
-                    # Gemini로 요약 생성 (재시도 로직 포함)
-                    summary, retry_delay = self._gemini_summarize(content, title)
-                    
-                    # 429 에러인 경우에만 120초 대기 후 1회 재시도
-                    if summary is None and retry_delay is not None:
-                        self.logger.info(f"[{idx}/{total_count}] post_id={post_id}: 429 에러 발생, 120초 후 1회 재시도...")
-                        time.sleep(120)
-                        summary, retry_delay_after_retry = self._gemini_summarize(content, title)
-                        
-                        # 재시도 후에도 429 에러가 발생하면 할당량 제한으로 판단하고 스크립트 종료
-                        if summary is None and retry_delay_after_retry is not None:
-                            self.logger.error(f"[{idx}/{total_count}] post_id={post_id}: 재시도 후에도 429 에러 발생. 할당량 제한으로 판단하여 스크립트를 종료합니다.")
-                            self.logger.info(f"처리 완료된 포스트: {success_count}건, 실패: {fail_count}건")
-                            return
-                        
-                        if summary is None:
-                            self.logger.warning(f"[{idx}/{total_count}] post_id={post_id}: 재시도 후에도 실패, 다음 실행으로 넘어감")
-                    
-                    # 요약 생성 실패 시 건너뛰기
-                    if summary is None:
-                        fail_count += 1
-                        self.logger.warning(f"[{idx}/{total_count}] post_id={post_id}: 요약 생성 실패로 건너뜀")
+            # 요약 생성(Gemini 호출)은 워커 스레드에서 병렬로 실행하고,
+            # DB 확인/업데이트는 현재 스레드에서 제출 순서대로 처리함
+            executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="ai-summary")
+            in_flight = deque()
+            # 이번 실행에서 요청 중이거나 최근에 요약한 동일 본문은 Gemini를 다시 호출하지 않고 결과를 공유
+            in_flight_by_key = {}
+            recent_summaries = OrderedDict()
+            # posts_per_request > 1이면 짧은 포스트를 모아 두었다가 한 번에 요약
+            pending_group = []
+            pending_group_tokens = 0
+            posts = self._with_cached_summaries(conn, rows)
+            try:
+                for idx, (post_id, content, title, cache_key, cached_summary) in enumerate(posts, 1):
+                    if stats.quota_exhausted:
+                        break
+                    if self._stop_requested:
+                        stats.stopped = True
+                        self.logger.warning("종료 요청을 받아 새 요약 요청을 중단합니다.")
+                        break
+                    if self._budget_reached(metrics_snapshot):
+                        stats.budget_exhausted = True
+                        self.logger.warning("실행 예산(토큰/비용)에 도달하여 새 요약 요청을 중단합니다.")
+                        break
+
+                    processed_count = idx
+                    progress = f"{idx}/{total_count}" if total_count is not None else str(idx)
+                    try:
+                        # content가 None이거나 빈 문자열인 경우 건너뛰기 (이중 체크)
+                        if not content or not content.strip():
+                            self.logger.warning(f"[{progress}] post_id={post_id}: content가 비어있어 건너뜀")
+                            continue
+
+                        # summary가 이미 있는지는 UPDATE 시 summary IS NULL 조건으로 확인함
+                        if cached_summary is None and cache_key is not None:
+                            cached_summary = recent_summaries.get(cache_key)
+                        if cached_summary is not None:
+                            stats.cache_hits += 1
+                            self.logger.info(f"[{progress}] post_id={post_id}: 캐시된 요약 사용")
+                            future = Future()
+                            future.set_result((cached_summary, False, NO_TOKEN_USAGE))
+                            in_flight.append((progress, post_id, future, None))
+                        elif cache_key is not None and cache_key in in_flight_by_key:
+                            stats.cache_hits += 1
+                            self.logger.info(f"[{progress}] post_id={post_id}: 동일한 본문의 요약 결과 공유")
+                            in_flight.append((progress, post_id, self._share_result(in_flight_by_key[cache_key]), None))
+                        else:
+                            if cache_key is not None:
+                                stats.cache_misses += 1
+                            self.logger.info(f"[{progress}] post_id={post_id} 요약 생성 중...")
+                            if self.posts_per_request > 1 and estimate_tokens(content) <= self.batch_post_max_tokens:
+                                # 짧은 포스트는 묶어서 한 번의 요청으로 요약
+                                post_tokens = estimate_tokens(content)
+                                if pending_group and pending_group_tokens + post_tokens > self.max_input_tokens:
+                                    self._submit_post_group(executor, pending_group)
+                                    pending_group_tokens = 0
+                                future = Future()
+                                pending_group.append((post_id, content, title, progress, future))
+                                pending_group_tokens += post_tokens
+                                if len(pending_group) >= self.posts_per_request:
+                                    self._submit_post_group(executor, pending_group)
+                                    pending_group_tokens = 0
+                            else:
+                                future = executor.submit(self._summarize_with_retry, content, title, progress, post_id)
+                            in_flight.append((progress, post_id, future, cache_key))
+                            if cache_key is not None:
+                                in_flight_by_key[cache_key] = future
+
+                    except Exception as e:
+                        stats.fail_count += 1
+                        conn.rollback()
+                        error_msg = str(e)[:500]
+                        self.logger.error(f"[{progress}] post_id={post_id} 요약 실패: {error_msg}")
+                        # 예외가 발생해도 다음 포스트로 계속 진행
                         continue
-                    
-                    # DB 업데이트
-                    cur.execute(
-                        "UPDATE posts SET summary = %s WHERE post_id = %s",
-                        (summary, post_id)
-                    )
-                    conn.commit()
-                    
-                    success_count += 1
-                    self.logger.debug(f"요약 완료: {summary[:100]}...")
-                    
-                except Exception as e:
-                    fail_count += 1
-                    conn.rollback()
-                    error_msg = str(e)[:500]
-                    self.logger.error(f"[{idx}/{total_count}] post_id={post_id} 요약 실패: {error_msg}")
-                    # 예외가 발생해도 다음 포스트로 계속 진행
-                    continue
+
+                    # 동시 실행 수만큼 쌓이면 가장 먼저 제출한 결과부터 반영 (아직 모으는 중인 묶음은 제외)
+                    while len(in_flight) - len(pending_group) >= self.concurrency * self.posts_per_request:
+                        # 기다릴 결과가 아직 제출하지 않은 묶음에 있으면 먼저 제출해야 대기가 끝남
+                        head_future = in_flight[0][2]
+                        if any(future is head_future for _, _, _, _, future in pending_group):
+                            self._submit_post_group(executor, pending_group)
+                            pending_group_tokens = 0
+                        self._apply_next_result(writer, stats, in_flight, in_flight_by_key, recent_summaries)
+
+                # 아직 제출하지 않은 묶음은 할당량 소진, 예산 도달, 종료 요청이면 다음 실행으로 넘기고, 아니면 제출
+                if stats.quota_exhausted or stats.budget_exhausted or stats.stopped:
+                    for _, _, _, _, future in pending_group:
+                        future.set_result((None, True, NO_TOKEN_USAGE))
+                    pending_group.clear()
+                else:
+                    self._submit_post_group(executor, pending_group)
+
+                # 이미 요청한 요약은 할당량 소진 여부와 관계없이 끝까지 반영
+                while in_flight:
+                    self._apply_next_result(writer, stats, in_flight, in_flight_by_key, recent_summaries)
+            finally:
+                posts.close()
+                # 조회/임대/캐시 쿼리 오류로 트랜잭션이 중단되었어도 아래에서 요약을 반영할 수 있도록 정리
+                conn.rollback()
+                # 중간에 예외가 나면 아직 시작하지 않은 요청과 제출하지 않은 묶음은 취소하고 다음 실행으로 넘김
+                executor.shutdown(wait=True, cancel_futures=True)
+                for _, _, future, _ in in_flight:
+                    future.cancel()
+                # 이미 생성된 요약은 버리지 않고 반영
+                while in_flight:
+                    self._apply_next_result(writer, stats, in_flight, in_flight_by_key, recent_summaries)
+                writer.flush()
+                self._record_post_metrics(stats)
+
+            success_count = stats.success_count
+            fail_count = stats.fail_count
+
+            if stats.quota_exhausted:
+                self.logger.info(f"처리 완료된 포스트: {success_count}건, 실패: {fail_count}건, 중복: {stats.skipped_count}건, 캐시 사용: {stats.cache_hits}건")
+                self._log_batch(
+                    conn, "PARTIAL", success_count, fail_count, total_count or processed_count, "할당량 초과로 중단",
+                    self._run_detail(stats, start_time, metrics_snapshot, processed_count, "quota_exhausted"),
+                )
+                return "quota_exhausted"
+
+            if stats.budget_exhausted:
+                self.logger.info(f"실행 예산 도달로 중단 - 성공: {success_count}, 실패: {fail_count}, 중복: {stats.skipped_count}, 캐시 사용: {stats.cache_hits}")
+                self._log_batch(
+                    conn, "PARTIAL", success_count, fail_count, total_count or processed_count, "실행 예산 도달로 중단",
+                    self._run_detail(stats, start_time, metrics_snapshot, processed_count, "budget_exhausted"),
+                )
+                return "budget_exhausted"
+
+            if stats.stopped:
+                self.logger.info(f"종료 요청으로 중단 - 성공: {success_count}, 실패: {fail_count}, 중복: {stats.skipped_count}, 캐시 사용: {stats.cache_hits}")
+                self._log_batch(
+                    conn, "PARTIAL", success_count, fail_count, total_count or processed_count, "종료 요청으로 중단",
+                    self._run_detail(stats, start_time, metrics_snapshot, processed_count, "shutdown"),
+                )
+                return "shutdown"
+
+            if total_count is None:
+                total_count = processed_count
+                if total_count == 0:
+                    self.logger.info("요약할 포스트가 없습니다.")
+                    return "completed"
 
             elapsed = time.time() - start_time
-            self.logger.info(f"AI 요약 배치 완료 - 성공: {success_count}, 실패: {fail_count}, 소요시간: {elapsed:.2f}초")
+            self.logger.info(f"AI 요약 배치 완료 - 성공: {success_count}, 실패: {fail_count}, 중복: {stats.skipped_count}, 캐시 사용: {stats.cache_hits}, 소요시간: {elapsed:.2f}초")
 
             # 배치 로그 기록
-            self._log_batch("SUCCESS", success_count, fail_count, total_count, None)
+            self._log_batch(
+                conn, "SUCCESS", success_count, fail_count, total_count, None,
+                self._run_detail(stats, start_time, metrics_snapshot, processed_count, "completed"),
+            )
+            return "completed"
 
         except Exception as e:
             error_message = str(e)[:1000]
             self.logger.error(f"AI 요약 배치 실행 중 오류 발생: {error_message}")
-            self._log_batch("FAILED", 0, 0, 0, error_message)
+            # 로그 기록이 실패해도 원래 예외를 그대로 전달
+            try:
+                self._log_batch(
+                    conn, "FAILED", stats.success_count, stats.fail_count, total_count or processed_count, error_message,
+                    self._run_detail(stats, start_time, metrics_snapshot, processed_count, "error"),
+                )
+            except Exception as log_error:
+                self.logger.error(f"배치 로그 기록 실패: {str(log_error)[:500]}")
             raise
         finally:
+            # named 커서 또는 임대 제너레이터 정리
+            if row_source is not None:
+                row_source.close()
+            if read_conn is not None:
+                read_conn.rollback()
+                self._put_conn(read_conn)
             cur.close()
-            conn.close()
+            self._put_conn(conn)
+            self._push_metrics()
+
+    def _metrics_snapshot(self) -> dict:
+        """실행 시작 시점의 메트릭 값을 저장합니다. _run_detail()에서 이번 실행분만 계산할 때 사용합니다."""
+        return {
+            "stage_seconds": self._stage_seconds.snapshot(),
+            "gemini_requests": self._gemini_requests_total.snapshot(),
+            "gemini_retries": self._gemini_retries_total.snapshot(),
+            "gemini_tokens": self._gemini_tokens_total.snapshot(),
+            "fetched_bytes": self._fetched_bytes_total.snapshot(),
+        }
+
+    def _run_detail(self, stats: _RunStats, start_time: float, metrics_snapshot: dict, processed_count: int, stop_reason: str) -> dict:
+        """배치 로그 detail에 기록할 이번 실행의 통계를 만듭니다.
+        
+        단계별 지연 시간(p50/p95), 토큰 사용량, 429 횟수, 수집 바이트 수, 분당 처리량을 포함하며
+        stop_reason은 completed(정상 종료), quota_exhausted(할당량 초과로 중단),
+        budget_exhausted(실행 예산 도달로 중단), shutdown(종료 요청으로 중단), error(오류로 중단) 중 하나입니다.
+        """
+        elapsed = time.time() - start_time
+        input_tokens, output_tokens = self._run_token_usage(metrics_snapshot)
+        estimated_cost = self._estimate_cost(input_tokens, output_tokens)
+        return {
+            "skipped_count": stats.skipped_count,
+            "cache_hits": stats.cache_hits,
+            "cache_misses": stats.cache_misses,
+            "processed_count": processed_count,
+            "stop_reason": stop_reason,
+            "elapsed_seconds": round(elapsed, 2),
+            "posts_per_minute": round(stats.success_count / elapsed * 60, 2) if elapsed > 0 else None,
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "tokens_per_post": round((input_tokens + output_tokens) / stats.success_count, 1) if stats.success_count else None,
+            "estimated_cost": round(estimated_cost, 6),
+            "cost_per_post": round(estimated_cost / stats.success_count, 8) if stats.success_count else None,
+            "gemini_requests": int(self._gemini_requests_total.value_since(metrics_snapshot["gemini_requests"], result="success")),
+            "rate_limited_count": int(self._gemini_requests_total.value_since(metrics_snapshot["gemini_requests"], result="rate_limited")),
+            "retry_count": int(self._gemini_retries_total.value_since(metrics_snapshot["gemini_retries"])),
+            "bytes_fetched": int(self._fetched_bytes_total.value_since(metrics_snapshot["fetched_bytes"])),
+            "stage_latency": self._stage_seconds.summary("stage", since=metrics_snapshot["stage_seconds"]),
+        }
+
+    def _run_token_usage(self, metrics_snapshot: dict) -> Tuple[int, int]:
+        """실행 시작 후 사용한 (입력 토큰, 출력 토큰)을 반환합니다. 진행 중인 워커의 응답도 바로 반영됩니다."""
+        return (
+            int(self._gemini_tokens_total.value_since(metrics_snapshot["gemini_tokens"], type="prompt")),
+            int(self._gemini_tokens_total.value_since(metrics_snapshot["gemini_tokens"], type="output")),
+        )
+
+    def _estimate_cost(self, input_tokens: int, output_tokens: int) -> float:
+        """토큰 수와 100만 토큰당 가격으로 예상 비용을 계산합니다."""
+        return (input_tokens * self.input_token_price + output_tokens * self.output_token_price) / 1_000_000
+
+    def _budget_reached(self, metrics_snapshot: dict) -> bool:
+        """이번 실행의 토큰 사용량이나 예상 비용이 max_run_tokens/max_run_cost에 도달했는지 확인합니다.
+        
+        이미 요청 중인 요약은 끝까지 반영하므로 실제 사용량은 동시 요청 수만큼 예산을 넘을 수 있습니다.
+        """
+        if self.max_run_tokens is None and self.max_run_cost is None:
+            return False
+        input_tokens, output_tokens = self._run_token_usage(metrics_snapshot)
+        if self.max_run_tokens is not None and input_tokens + output_tokens >= self.max_run_tokens:
+            return True
+        return self.max_run_cost is not None and self._estimate_cost(input_tokens, output_tokens) >= self.max_run_cost
+
+    def _share_result(self, source: Future) -> Future:
+        """같은 본문을 요약 중인 요청의 결과를 공유하는 Future를 만듭니다. 토큰 사용량은 원래 포스트에만 기록합니다."""
+        shared = Future()
+
+        def copy_result(done: Future) -> None:
+            if shared.done():
+                return
+            if done.cancelled():
+                shared.cancel()
+                return
+            try:
+                summary, quota_exhausted, _ = done.result()
+            except Exception as e:
+                shared.set_exception(e)
+            else:
+                shared.set_result((summary, quota_exhausted, NO_TOKEN_USAGE))
+
+        source.add_done_callback(copy_result)
+        return shared
+
+    def _record_post_metrics(self, stats: _RunStats) -> None:
+        """실행 통계를 처리 결과별 포스트 수 메트릭에 더합니다."""
+        for result, count in (
+            ("success", stats.success_count),
+            ("failed", stats.fail_count),
+            ("skipped", stats.skipped_count),
+            ("cache_hit", stats.cache_hits),
+        ):
+            if count:
+                self._posts_total.inc(count, result=result)
+
+    def _push_metrics(self) -> None:
+        """metrics_push_url이 설정되어 있으면 Pushgateway로 메트릭을 전송합니다. 실패해도 배치 결과에는 영향을 주지 않습니다."""
+        if not self.metrics_push_url:
+            return
+        try:
+            self.metrics.push(self.metrics_push_url)
+        except Exception as e:
+            self.logger.warning(f"메트릭 전송 실패: {str(e)[:200]}")
+
+    def run_offline_batch(self) -> None:
+        """Gemini Batch API로 요약 대상 포스트를 한 번에 처리합니다. (대량 백필용 오프라인 모드)
+        
+        요약 대상을 JSONL 배치 입력 파일로 만들어 업로드하고, 작업 완료를 기다린 뒤
+        결과를 모아서 posts.summary에 반영합니다. 응답 지연 대신 비용과 429 에러를 줄이는 용도이며,
+        max_input_tokens를 넘는 긴 글은 조각 요약이 필요하므로 일반 run()에서 처리하도록 남겨둡니다.
+        
+        제출한 포스트는 batch_timeout 동안 임대(CLAIM_COLUMNS)하고 summary_claimed_by에 배치 작업 이름을 기록하므로,
+        작업이 도는 동안 run()이나 다른 작업자가 같은 포스트를 다시 요약하지 않습니다.
+        결과를 반영하기 전에 중단되면 다음 실행에서 같은 작업의 결과를 먼저 반영합니다.
+        """
+        start_time = time.time()
+        metrics_snapshot = self._metrics_snapshot()
+        self.logger.info("AI 요약 오프라인 배치 시작")
 
-    def _log_batch(self, status: str, success_count: int, fail_count: int, total_count: int, error_message: Optional[str]) -> None:
-        """batch_logs 테이블에 배치 실행 로그를 기록합니다."""
         conn = self._get_conn()
+        client = GeminiBatchClient(self.gemini_api_key, self.batch_api_base_url)
+        input_path = None
+        stats = _RunStats()
+        total_count = 0
+        batch_names = []
+        pending_token = f"{OFFLINE_PENDING_CLAIM_PREFIX}{self.worker_id}"
+        
+        try:
+            if self.store_token_usage:
+                self._ensure_columns(conn, "posts", TOKEN_USAGE_COLUMNS)
+            self._ensure_columns(conn, "posts", CLAIM_COLUMNS)
+            self._check_priority_columns(conn)
+
+            # 0. 이전 실행에서 결과를 반영하지 못한 배치 작업을 먼저 처리
+            for batch_name in self._claimed_offline_batches(conn):
+                self.logger.info(f"이전 실행의 배치 작업 결과 반영: {batch_name}")
+                try:
+                    total_count += self._apply_offline_batch(conn, client, stats, batch_name)
+                except GeminiBatchError as e:
+                    self.logger.warning(f"이전 배치 작업 결과를 반영하지 못해 임대를 해제합니다: {e}")
+                    continue
+                batch_names.append(batch_name)
+
+            # 1. 요약 대상 포스트를 임대하고 JSONL 배치 입력으로 기록 (서버 사이드 커서로 메모리 사용량 제한)
+            self._claim_offline_posts(conn, pending_token)
+            count = 0
+            skipped_ids = []
+            with tempfile.NamedTemporaryFile("w", suffix=".jsonl", encoding="utf-8", delete=False) as f:
+                input_path = f.name
+                rows_cur = conn.cursor(name="ai_summary_offline_posts")
+                rows_cur.itersize = self.itersize
+                try:
+                    rows_cur.execute(OFFLINE_CLAIMED_POSTS_QUERY, {"claim_token": pending_token})
+                    for post_id, content, title in rows_cur:
+                        if not content or not content.strip():
+                            skipped_ids.append(post_id)
+                            continue
+                        if estimate_tokens(content) > self.max_input_tokens:
+                            skipped_ids.append(post_id)
+                            continue
+                        request = {
+                            "contents": [{"role": "user", "parts": [{"text": self._build_summary_prompt(content, title)}]}],
+                            "system_instruction": {"parts": [{"text": SUMMARY_RULES}]},
+                        }
+                        f.write(json.dumps({"key": str(post_id), "request": request}, ensure_ascii=False) + "\n")
+                        count += 1
+                finally:
+                    rows_cur.close()
+                    conn.commit()
+            
+            if skipped_ids:
+                # 긴 글은 일반 run()에서 조각 요약하도록 임대 해제
+                self._release_offline_claims(conn, pending_token, skipped_ids)
+                self.logger.info(f"긴 글 {len(skipped_ids)}개는 일반 배치에서 조각 요약하도록 제외")
+            
+            if count == 0:
+                if not batch_names:
+                    self.logger.info("요약할 포스트가 없습니다.")
+                    return
+            else:
+                self.logger.info(f"요약 대상 포스트 {count}개로 배치 작업 생성")
+
+                # 2. 업로드 및 배치 작업 생성
+                display_name = f"ai-summary-{time.strftime('%Y%m%d%H%M%S')}"
+                try:
+                    file_name = client.upload_jsonl(input_path, display_name)
+                    batch_name = client.create_batch(GEMINI_MODEL_NAME, file_name, display_name)
+                except Exception:
+                    # 작업을 만들지 못했으면 임대를 해제하여 다음 실행이나 run()에서 다시 처리
+                    self._release_offline_claims(conn, pending_token)
+                    raise
+                self.logger.info(f"배치 작업 생성: {batch_name}")
+                # 임대에 작업 이름을 기록하여 결과 반영 전에 중단되어도 다음 실행에서 이어서 처리
+                self._rename_offline_claims(conn, pending_token, f"{OFFLINE_CLAIM_PREFIX}{batch_name}")
+                total_count += count
+
+                # 3. 완료를 기다려 결과 반영
+                self._apply_offline_batch(conn, client, stats, batch_name)
+                batch_names.append(batch_name)
+
+            elapsed = time.time() - start_time
+            self.logger.info(f"AI 요약 오프라인 배치 완료 - 성공: {stats.success_count}, 실패: {stats.fail_count}, 중복: {stats.skipped_count}, 소요시간: {elapsed:.2f}초")
+            self._log_batch(
+                conn, "SUCCESS", stats.success_count, stats.fail_count, total_count, None,
+                {
+                    **self._run_detail(stats, start_time, metrics_snapshot, total_count, "completed"),
+                    "mode": "offline_batch",
+                    "batch_names": batch_names,
+                },
+            )
+
+        except Exception as e:
+            error_message = str(e)[:1000]
+            self.logger.error(f"AI 요약 오프라인 배치 실행 중 오류 발생: {error_message}")
+            # 로그 기록이 실패해도 원래 예외를 그대로 전달
+            try:
+                self._log_batch(
+                    conn, "FAILED", stats.success_count, stats.fail_count, total_count, error_message,
+                    {
+                        **self._run_detail(stats, start_time, metrics_snapshot, total_count, "error"),
+                        "mode": "offline_batch",
+                        "batch_names": batch_names,
+                    },
+                )
+            except Exception as log_error:
+                self.logger.error(f"배치 로그 기록 실패: {str(log_error)[:500]}")
+            raise
+        finally:
+            client.close()
+            if input_path and os.path.exists(input_path):
+                os.remove(input_path)
+            self._put_conn(conn)
+            self._record_post_metrics(stats)
+            self._push_metrics()
+
+    def _claim_offline_posts(self, conn, claim_token: str) -> None:
+        """임대되지 않은 요약 대상 포스트를 batch_timeout 동안 오프라인 배치용으로 임대합니다."""
+        query = OFFLINE_CLAIM_QUERY.format(pending_query=self._unclaimed_posts_query, lease_condition=CLAIM_LEASE_CONDITION)
+        params = {
+            **self._query_params,
+            "claim_token": claim_token,
+            # 임대 조건은 summary_claimed_at + lease_seconds이므로 batch_timeout이 지나야 만료되도록 미래 시각으로 설정
+            "lease_extension": max(0, self.batch_timeout - self.lease_seconds),
+        }
+        cur = conn.cursor()
+        try:
+            with self._stage_seconds.time(stage="select"):
+                cur.execute(query, params)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cur.close()
+
+    def _claimed_offline_batches(self, conn) -> list:
+        """임대가 남아 있는(결과를 반영하지 못한) 오프라인 배치 작업 이름 목록을 조회합니다."""
+        cur = conn.cursor()
+        try:
+            cur.execute(OFFLINE_CLAIMED_BATCHES_QUERY, {"lease_seconds": self.lease_seconds})
+            tokens = sorted(row[0] for row in cur.fetchall())
+            conn.commit()
+        finally:
+            cur.close()
+        return [token[len(OFFLINE_CLAIM_PREFIX):] for token in tokens]
+
+    def _rename_offline_claims(self, conn, claim_token: str, new_token: str) -> None:
+        """임대한 포스트의 summary_claimed_by를 new_token으로 바꿉니다."""
+        cur = conn.cursor()
+        try:
+            cur.execute(
+                "UPDATE posts SET summary_claimed_by = %s WHERE summary_claimed_by = %s",
+                (new_token, claim_token),
+            )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cur.close()
+
+    def _release_offline_claims(self, conn, claim_token: str, post_ids: Optional[list] = None) -> None:
+        """아직 요약되지 않은 포스트의 오프라인 배치 임대를 해제합니다. post_ids를 주면 해당 포스트만 해제합니다."""
+        query = OFFLINE_RELEASE_QUERY
+        params = {"claim_token": claim_token}
+        if post_ids is not None:
+            query += "  AND post_id = ANY(%(post_ids)s)"
+            params["post_ids"] = list(post_ids)
+        cur = conn.cursor()
+        try:
+            cur.execute(query, params)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cur.close()
+
+    def _apply_offline_batch(self, conn, client: GeminiBatchClient, stats: _RunStats, batch_name: str) -> int:
+        """배치 작업 완료를 기다려 결과를 posts.summary에 반영하고, 요약하지 못한 포스트의 임대를 해제합니다.
+        
+        작업이 실패/만료되었거나 batch_timeout이 지나면 임대를 해제하고 GeminiBatchError를 그대로 전달합니다.
+        그 밖의 오류(네트워크 등)에서는 임대를 남겨두어 다음 실행에서 같은 작업을 이어서 처리합니다.
+        
+        Returns:
+            int: 배치 결과 건수
+        """
+        claim_token = f"{OFFLINE_CLAIM_PREFIX}{batch_name}"
+        try:
+            responses_file = client.wait(batch_name, self.batch_poll_interval, self.batch_timeout)
+        except GeminiBatchError:
+            self._release_offline_claims(conn, claim_token)
+            raise
+
+        # 결과를 쓰기 버퍼로 모아서 반영 (요약 백엔드와 관계없이 Gemini Batch API의 결과)
+        result_count = 0
+        writer = _SummaryWriter(conn, stats, self.logger, self.write_batch_size, self.write_flush_interval, GEMINI_MODEL_NAME, self._stage_seconds, self.store_token_usage)
+        try:
+            for key, summary, error, usage in client.iter_results(responses_file):
+                result_count += 1
+                if usage[0]:
+                    self._gemini_tokens_total.inc(usage[0], type="prompt")
+                if usage[1]:
+                    self._gemini_tokens_total.inc(usage[1], type="output")
+                if summary is None:
+                    stats.fail_count += 1
+                    self.logger.warning(f"post_id={key}: 배치 요약 실패 - {error}")
+                    continue
+                try:
+                    post_id = int(key)
+                except ValueError:
+                    post_id = key
+                writer.add(post_id, summary, usage=usage)
+        finally:
+            writer.flush()
+        
+        # 요약에 실패한 포스트는 다음 실행에서 다시 처리하도록 임대 해제
+        self._release_offline_claims(conn, claim_token)
+        return result_count
+
+    def stop(self) -> None:
+        """진행 중인 run()/run_daemon()에 종료를 요청합니다.
+        
+        이미 요청한 요약은 끝까지 반영하고 새 포스트는 처리하지 않습니다. 속도 제한이나 429 백오프로 대기 중인
+        요청은 보내지 않고 다음 실행으로 넘깁니다. 시그널 핸들러에서 호출해도 안전합니다.
+        """
+        self._stop_requested = True
+        self.rate_limiter.stop()
+        if self._wakeup_fd is not None:
+            try:
+                os.write(self._wakeup_fd, b"\0")
+            except OSError:
+                pass
+
+    def _ensure_notify_trigger(self, conn) -> None:
+        """posts에 새 포스트 알림 트리거가 없으면 생성합니다."""
+        cur = conn.cursor()
+        try:
+            cur.execute(
+                "SELECT 1 FROM pg_trigger WHERE tgname = %s AND tgrelid = 'posts'::regclass",
+                (NOTIFY_TRIGGER_NAME,),
+            )
+            if cur.fetchone() is None:
+                cur.execute(NOTIFY_FUNCTION_SQL)
+                cur.execute(NOTIFY_TRIGGER_SQL.format(channel=self.daemon_channel))
+                self.logger.info(f"새 포스트 알림 트리거 생성 (채널={self.daemon_channel})")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cur.close()
+
+    def _open_listener(self):
+        """알림 전용 커넥션을 열고 daemon_channel을 LISTEN합니다. 연결할 수 없으면 None을 반환합니다."""
+        conn = None
+        try:
+            conn = psycopg2.connect(**self.db_config)
+            conn.autocommit = True
+            cur = conn.cursor()
+            cur.execute(f"LISTEN {self.daemon_channel}")
+            cur.close()
+            self.logger.info(f"새 포스트 알림 대기 시작 (채널={self.daemon_channel})")
+            return conn
+        except psycopg2.Error as e:
+            if conn is not None:
+                conn.close()
+            self.logger.warning(f"알림 채널 연결 실패, 폴링으로 처리하며 {LISTEN_RECONNECT_DELAY:.0f}초 후 다시 연결합니다: {str(e)[:200]}")
+            return None
+
+    def _drain_notifies(self, listen_conn) -> bool:
+        """쌓인 알림을 모두 읽고 비웁니다. 알림이 있었거나 연결이 끊겼으면 True를 반환합니다.
+        
+        연결이 끊긴 동안의 알림은 받을 수 없으므로 새 포스트가 있는 것으로 보고 실행하도록 합니다.
+        """
+        try:
+            listen_conn.poll()
+        except psycopg2.Error as e:
+            self.logger.warning(f"알림 채널 연결이 끊겼습니다: {str(e)[:200]}")
+            listen_conn.close()
+            return True
+        received = bool(listen_conn.notifies)
+        listen_conn.notifies.clear()
+        return received
+
+    def _wait_for_wakeup(self, wakeup_fd: int, listen_conn, timeout: float) -> bool:
+        """알림, stop() 호출, timeout 중 하나가 올 때까지 기다립니다. 알림을 받았으면 True를 반환합니다."""
+        fds = [wakeup_fd] if listen_conn is None or listen_conn.closed else [wakeup_fd, listen_conn]
+        readable, _, _ = select.select(fds, [], [], max(0.0, timeout))
+        if wakeup_fd in readable:
+            os.read(wakeup_fd, 1024)
+        if listen_conn is not None and listen_conn in readable:
+            return self._drain_notifies(listen_conn)
+        return False
+
+    def run_daemon(self) -> None:
+        """새 포스트 알림(LISTEN)을 기다리며 요약을 계속 생성합니다. stop()이 호출될 때까지 반환하지 않습니다.
+        
+        DB 커넥션 풀, 요약 백엔드, HTTP 세션은 실행 사이에 닫지 않고 재사용합니다.
+        시작하면 밀린 포스트를 먼저 처리하고, 이후 알림을 받으면 daemon_debounce초 동안 이어지는 알림을 모아
+        run()을 한 번 실행합니다. 알림이 없어도 daemon_poll_interval초마다 실행해 트리거 없이 추가되었거나
+        알림 연결이 끊긴 동안 추가된 포스트를 처리합니다. 할당량 초과, 예산 도달, 오류로 끝난 경우에는
+        알림이 와도 daemon_poll_interval초가 지난 뒤에 다시 실행합니다.
+        
+        알림마다 요약에 실패한 포스트를 다시 요청하지 않도록 항상 임대 방식(claim_mode)으로 처리하므로,
+        실패한 포스트는 lease_seconds가 지난 뒤에 다시 시도합니다.
+        """
+        self.logger.info(f"AI 요약 데몬 시작 (채널={self.daemon_channel}, 폴링 간격={self.daemon_poll_interval:.0f}초)")
+        if not self.claim_mode:
+            self.logger.info("데몬 모드에서는 실패한 포스트를 알림마다 다시 요청하지 않도록 임대 방식으로 처리합니다.")
+            self.claim_mode = True
+        if self.install_notify_trigger:
+            conn = self._get_conn()
+            try:
+                self._ensure_notify_trigger(conn)
+            finally:
+                self._put_conn(conn)
+
+        wakeup_read, self._wakeup_fd = os.pipe()
+        os.set_blocking(self._wakeup_fd, False)
+        listen_conn = None
+        next_connect = 0.0
+        # 시작 시 밀린 포스트부터 처리
+        pending = True
+        last_run = float("-inf")
+        cooldown_until = 0.0
+        try:
+            while not self._stop_requested:
+                now = time.monotonic()
+                if (listen_conn is None or listen_conn.closed) and now >= next_connect:
+                    listen_conn = self._open_listener()
+                    next_connect = now + LISTEN_RECONNECT_DELAY
+                    # 연결하기 전의 알림은 받지 못했으므로 한 번 실행해서 확인
+                    pending = pending or listen_conn is not None
+
+                if (pending and now >= cooldown_until) or now - last_run >= self.daemon_poll_interval:
+                    pending = False
+                    try:
+                        self.backend.refresh()
+                        stop_reason = self.run()
+                    except Exception as e:
+                        # 오류는 run()이 배치 로그에 남겼으므로 데몬은 계속 실행
+                        self.logger.error(f"데몬 실행 중 오류 발생, {self.daemon_poll_interval:.0f}초 후 다시 시도합니다: {str(e)[:500]}")
+                        stop_reason = "error"
+                    last_run = time.monotonic()
+                    if stop_reason in ("quota_exhausted", "budget_exhausted", "error"):
+                        cooldown_until = last_run + self.daemon_poll_interval
+                    continue
+
+                timeout = last_run + self.daemon_poll_interval - now
+                if pending:
+                    timeout = min(timeout, cooldown_until - now)
+                if listen_conn is None or listen_conn.closed:
+                    timeout = min(timeout, next_connect - now)
+                if self._wait_for_wakeup(wakeup_read, listen_conn, timeout):
+                    pending = True
+                    # 여러 포스트가 연달아 추가되는 경우 한 번에 처리하도록 잠시 더 모음
+                    self._wait_for_wakeup(wakeup_read, None, self.daemon_debounce)
+                    if listen_conn is not None and not listen_conn.closed:
+                        self._drain_notifies(listen_conn)
+        finally:
+            if listen_conn is not None and not listen_conn.closed:
+                listen_conn.close()
+            os.close(wakeup_read)
+            os.close(self._wakeup_fd)
+            self._wakeup_fd = None
+            self.logger.info("AI 요약 데몬 종료")
+
+    def _log_batch(self, conn, status: str, success_count: int, fail_count: int, total_count: int, error_message: Optional[str], extra: Optional[dict] = None) -> None:
+        """batch_logs 테이블에 배치 실행 로그를 기록합니다. extra는 detail JSON에 함께 기록됩니다.
+        
+        status는 SUCCESS, FAILED, PARTIAL(할당량 초과 등으로 중간에 멈춤) 중 하나입니다.
+        풀에서 커넥션을 하나 더 꺼내지 않도록 실행 중인 커넥션(conn)에 기록합니다.
+        """
+        start = time.perf_counter()
+        # 실패한 경우 중단된 트랜잭션이 남아 있을 수 있으므로 먼저 정리
+        conn.rollback()
         cur = conn.cursor()
         try:
             detail = {
@@ -262,8 +2048,10 @@ class AISummaryBatchService:
                 "fail_count": fail_count,
                 "total_count": total_count,
             }
+            if extra:
+                detail.update(extra)
             
-            log_level = "ERROR" if status == "FAILED" else "INFO"
+            log_level = {"FAILED": "ERROR", "PARTIAL": "WARNING"}.get(status, "INFO")
             
             cur.execute(
                 """
@@ -275,5 +2063,5 @@ class AISummaryBatchService:
             conn.commit()
         finally:
             cur.close()
-            conn.close()
+            self._stage_seconds.observe(time.perf_counter() - start, stage="log")
 
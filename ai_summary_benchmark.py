@@ -0,0 +1,439 @@
+"""AI 요약 배치 파이프라인 벤치마크
+
+별도 스키마(ai_summary_bench)에 가짜 포스트 N개를 만들고, FakeBackend로 run()을 실행해
+처리량, 포스트당 DB 왕복 수, 최대 RSS, 단계별 소요 시간을 측정합니다.
+최대 RSS는 프로세스 전체의 최대값이므로 가짜 포스트 생성, 파이프라인, 수집 단계를 각각 새 자식 프로세스에서 실행합니다.
+이어서 로컬 스텁 HTTP 서버로 URL 본문 수집(순차/비동기)과 본문 추출 파서(lxml/bs4)를 비교합니다.
+결과는 JSON 파일로 저장되므로 이전 실행 결과와 비교할 수 있습니다.
+
+벤치마크 스키마를 지우고 다시 만들며 부하를 주므로 운영 DB 설정(get_db_config)은 사용하지 않고,
+--dsn 또는 AI_SUMMARY_BENCH_DSN 환경 변수로 벤치마크용 DB를 명시해야 합니다.
+
+사용 예:
+    python ai_summary_benchmark.py --dsn postgresql://localhost/ai_summary_bench --posts 2000 --concurrency 8 --posts-per-request 5
+"""
+import argparse
+import functools
+import json
+import logging
+import multiprocessing
+import os
+import random
+import resource
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List
+import psycopg2
+import psycopg2.extensions
+from psycopg2.extras import execute_values
+from config import setup_logging
+from ai_summary_backend import FakeBackend
+from ai_summary_batch_service import AISummaryBatchService, _SummaryWriter
+from ai_summary_fetcher import extract_text
+
+BENCH_SCHEMA = "ai_summary_bench"
+
+# 벤치마크 전용 스키마의 테이블 (매 실행마다 새로 만듦)
+BENCH_SCHEMA_DDL = f"""
+    CREATE SCHEMA IF NOT EXISTS {BENCH_SCHEMA};
+    DROP TABLE IF EXISTS {BENCH_SCHEMA}.posts, {BENCH_SCHEMA}.batch_logs, {BENCH_SCHEMA}.ai_summary_cache;
+    CREATE TABLE {BENCH_SCHEMA}.posts (
+        post_id BIGSERIAL PRIMARY KEY,
+        title TEXT,
+        content TEXT,
+        summary TEXT
+    );
+    CREATE TABLE {BENCH_SCHEMA}.batch_logs (
+        id BIGSERIAL PRIMARY KEY,
+        job_type TEXT,
+        log_level TEXT,
+        status TEXT,
+        affected_count INTEGER,
+        detail JSONB,
+        error_message TEXT,
+        created_at TIMESTAMPTZ DEFAULT now()
+    );
+"""
+
+SENTENCES = [
+    "이번 릴리스에서는 커넥션 풀 설정이 바뀌어 초기 연결 지연이 줄었습니다.",
+    "캐시 무효화 전략을 바꾼 뒤 p95 응답 시간이 크게 개선되었습니다.",
+    "The new scheduler batches writes and flushes them every few seconds.",
+    "쿠버네티스 HPA 설정과 함께 리소스 요청량을 다시 산정했습니다.",
+    "We replaced the ORM query with a single UPDATE ... FROM (VALUES ...) statement.",
+    "장애 원인은 타임아웃 없이 외부 API를 호출하던 코드였습니다.",
+    "Index-only scans became possible after adding a covering index.",
+    "팀은 점진적 배포를 위해 기능 플래그를 도입했습니다.",
+]
+
+
+class _StageTimer:
+    """단계별 소요 시간을 모아 횟수, 합계, p50/p95/최대값을 계산합니다. 여러 스레드에서 호출됩니다."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._samples: Dict[str, List[float]] = {}
+
+    def record(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            self._samples.setdefault(stage, []).append(seconds)
+
+    def wrap(self, stage: str, func):
+        """func 호출 시간을 stage로 기록하는 래퍼를 반환합니다."""
+        @functools.wraps(func)
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.record(stage, time.perf_counter() - start)
+        return timed
+
+    def summary(self) -> Dict[str, dict]:
+        with self._lock:
+            return {stage: _describe(samples) for stage, samples in self._samples.items()}
+
+
+def _percentile(sorted_values: List[float], pct: float) -> float:
+    index = min(len(sorted_values) - 1, max(0, int(round(pct / 100.0 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def _describe(samples: List[float]) -> dict:
+    values = sorted(samples)
+    if not values:
+        return {"count": 0}
+    return {
+        "count": len(values),
+        "total_s": round(sum(values), 4),
+        "p50_ms": round(_percentile(values, 50) * 1000, 2),
+        "p95_ms": round(_percentile(values, 95) * 1000, 2),
+        "max_ms": round(values[-1] * 1000, 2),
+    }
+
+
+# DB 왕복 수 측정: 커서 execute와 commit/rollback을 문장 종류별로 기록
+_db_timer = _StageTimer()
+
+
+def _statement_kind(query) -> str:
+    if isinstance(query, bytes):
+        query = query.decode("utf-8", "replace")
+    words = str(query).split(None, 1)
+    return f"db_{words[0].lower()}" if words else "db_other"
+
+
+class _CountingCursor(psycopg2.extensions.cursor):
+    def execute(self, query, vars=None):
+        start = time.perf_counter()
+        try:
+            return super().execute(query, vars)
+        finally:
+            _db_timer.record(_statement_kind(query), time.perf_counter() - start)
+
+
+class _CountingConnection(psycopg2.extensions.connection):
+    def commit(self):
+        start = time.perf_counter()
+        try:
+            return super().commit()
+        finally:
+            _db_timer.record("db_commit", time.perf_counter() - start)
+
+    def rollback(self):
+        start = time.perf_counter()
+        try:
+            return super().rollback()
+        finally:
+            _db_timer.record("db_rollback", time.perf_counter() - start)
+
+
+def _peak_rss_mb() -> float:
+    # 리눅스에서 ru_maxrss 단위는 KB
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0, 1)
+
+
+def _init_child_logging() -> None:
+    setup_logging()
+    # 포스트별 INFO 로그는 측정에 영향을 주므로 경고 이상만 출력
+    logging.getLogger("ai-summary-batch").setLevel(logging.WARNING)
+
+
+def _run_in_child(func, *args):
+    """func를 새 자식 프로세스(spawn)에서 실행하고 결과를 반환합니다.
+
+    ru_maxrss는 프로세스가 시작된 뒤의 최대값이므로, 단계마다 새 프로세스에서 실행해야
+    앞 단계(가짜 포스트 생성 등)의 메모리 사용량이 다음 단계의 최대 RSS에 섞이지 않습니다.
+    """
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(1, initializer=_init_child_logging) as pool:
+        return pool.apply(func, args)
+
+
+def _bench_db_config(db_config: dict) -> dict:
+    """search_path를 벤치마크 스키마로 바꾸고 DB 왕복을 세는 커넥션/커서를 사용하는 설정을 만듭니다."""
+    config = dict(db_config)
+    options = config.get("options", "")
+    config["options"] = f"{options} -c search_path={BENCH_SCHEMA}".strip()
+    config["connection_factory"] = _CountingConnection
+    config["cursor_factory"] = _CountingCursor
+    return config
+
+
+def _make_content(rng: random.Random, sentences: int) -> str:
+    return "\n".join(rng.choice(SENTENCES) for _ in range(sentences))
+
+
+def seed_posts(db_config: dict, count: int, long_ratio: float, dup_ratio: float, seed: int) -> None:
+    """벤치마크 스키마를 새로 만들고 가짜 포스트 count개를 넣습니다."""
+    rng = random.Random(seed)
+    rows = []
+    for i in range(count):
+        roll = rng.random()
+        if rows and roll < dup_ratio:
+            # 앞에서 만든 포스트와 제목/본문이 같은 중복 포스트
+            rows.append(rng.choice(rows))
+        elif roll < dup_ratio + long_ratio:
+            rows.append((f"긴 글 {i}", _make_content(rng, 600)))
+        else:
+            rows.append((f"포스트 {i}", _make_content(rng, rng.randint(5, 40))))
+
+    conn = psycopg2.connect(**db_config)
+    try:
+        cur = conn.cursor()
+        cur.execute(BENCH_SCHEMA_DDL)
+        execute_values(cur, f"INSERT INTO {BENCH_SCHEMA}.posts (title, content) VALUES %s", rows, page_size=1000)
+        conn.commit()
+        cur.close()
+    finally:
+        conn.close()
+
+
+def bench_pipeline(db_config: dict, args) -> dict:
+    """FakeBackend로 run()을 실행하고 처리량과 단계별 시간을 측정합니다."""
+    stages = _StageTimer()
+    backend = FakeBackend(
+        latency=args.latency,
+        latency_jitter=args.latency_jitter,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        retry_delay=args.retry_delay,
+        seed=args.seed,
+    )
+    service = AISummaryBatchService(
+        _bench_db_config(db_config),
+        "benchmark",
+        backend=backend,
+        stream_rows=args.stream_rows,
+        concurrency=args.concurrency,
+        posts_per_request=args.posts_per_request,
+        write_batch_size=args.write_batch_size,
+        claim_mode=args.claim_mode,
+        use_summary_cache=args.use_summary_cache,
+    )
+    # 인스턴스 메서드를 감싸서 단계별 시간을 기록 (서비스 코드는 그대로 사용)
+    service._gemini_summarize = stages.wrap("summarize", service._gemini_summarize)
+    service._gemini_summarize_batch = stages.wrap("summarize_batch", service._gemini_summarize_batch)
+    service._log_batch = stages.wrap("log", service._log_batch)
+    original_flush = _SummaryWriter.flush
+    _SummaryWriter.flush = stages.wrap("write", original_flush)
+
+    rss_before = _peak_rss_mb()
+    start = time.perf_counter()
+    try:
+        service.run()
+    finally:
+        elapsed = time.perf_counter() - start
+        _SummaryWriter.flush = original_flush
+        service.close()
+    # 서비스가 직접 기록한 단계별 시간 (select, cache_lookup, rate_limit_wait 등 감싸지 않은 단계 포함)
+    service_stages = service._stage_seconds.summary("stage")
+
+    # 결과 확인용 조회는 왕복 수에 포함하지 않음
+    db_stats = _db_timer.summary()
+    round_trips = sum(stat["count"] for stat in db_stats.values())
+
+    conn = psycopg2.connect(**_bench_db_config(db_config))
+    try:
+        cur = conn.cursor()
+        cur.execute("SELECT count(*) FROM posts WHERE summary IS NOT NULL")
+        summarized = cur.fetchone()[0]
+        cur.execute("SELECT detail FROM batch_logs ORDER BY id DESC LIMIT 1")
+        row = cur.fetchone()
+        batch_detail = row[0] if row else None
+    finally:
+        conn.close()
+
+    return {
+        "wall_time_s": round(elapsed, 3),
+        "summarized_posts": summarized,
+        "posts_per_second": round(summarized / elapsed, 2) if elapsed else None,
+        "db_round_trips": round_trips,
+        "db_round_trips_per_post": round(round_trips / args.posts, 3) if args.posts else None,
+        "backend_calls": backend.call_count,
+        "backend_429": backend.rate_limited_count,
+        "backend_errors": backend.error_count,
+        "peak_rss_mb": _peak_rss_mb(),
+        "peak_rss_before_mb": rss_before,
+        "stages": stages.summary(),
+        "service_stages": service_stages,
+        "db": db_stats,
+        "batch_log_detail": batch_detail,
+    }
+
+
+def _make_article_html(page_id: int) -> bytes:
+    rng = random.Random(page_id)
+    paragraphs = "".join(f"<p>{_make_content(rng, 4)}</p>" for _ in range(rng.randint(10, 40)))
+    return f"""<!DOCTYPE html><html><head><title>포스트 {page_id}</title>
+<script>var tracking = {{id: {page_id}}};</script><style>body {{ font-family: sans-serif; }}</style></head>
+<body><nav><a href="/">홈</a> <a href="/tags">태그</a> <a href="/about">소개</a></nav>
+<aside><ul>{''.join(f'<li><a href="/posts/{n}">추천 글 {n}</a></li>' for n in range(20))}</ul></aside>
+<article><h1>포스트 {page_id}</h1>{paragraphs}</article>
+<footer>Copyright. 모든 권리 보유.</footer></body></html>""".encode("utf-8")
+
+
+class _StubPageHandler(BaseHTTPRequestHandler):
+    """/posts/<id> 경로에 고정된 기사 HTML을 응답하는 스텁 서버 핸들러입니다."""
+
+    protocol_version = "HTTP/1.1"
+    delay = 0.0
+
+    def do_GET(self):
+        try:
+            page_id = int(self.path.rstrip("/").rsplit("/", 1)[-1])
+        except ValueError:
+            self.send_error(404)
+            return
+        if self.delay:
+            time.sleep(self.delay)
+        body = _make_article_html(page_id)
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def bench_fetch(args) -> dict:
+    """로컬 스텁 서버로 URL 본문 수집과 본문 추출 파서를 비교합니다."""
+    handler = type("StubPageHandler", (_StubPageHandler,), {"delay": args.page_delay})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    urls = [f"{base_url}/posts/{i}" for i in range(args.fetch_urls)]
+    results = {"urls": len(urls), "page_delay_s": args.page_delay, "peak_rss_before_mb": _peak_rss_mb()}
+
+    try:
+        # 1. 본문 추출 파서 비교 (같은 HTML로 CPU 시간만 측정)
+        pages = [_make_article_html(i) for i in range(min(len(urls), 200))]
+        for parser in ("lxml", "bs4"):
+            timer = _StageTimer()
+            extract = timer.wrap("extract", extract_text)
+            for html in pages:
+                extract(html, None, parser)
+            results[f"extract_{parser}"] = timer.summary()["extract"]
+
+        # 2. 순차 수집 (_fetch_url_content) vs 비동기 수집 (fetch_urls)
+        for parser in ("lxml", "bs4"):
+            service = AISummaryBatchService(
+                {}, "benchmark", backend=FakeBackend(),
+                extract_parser=parser, fetch_concurrency=args.fetch_concurrency, fetch_per_host=args.fetch_concurrency,
+            )
+            try:
+                timer = _StageTimer()
+                service._extract_text = timer.wrap("extract", service._extract_text)
+                fetch = timer.wrap("fetch", service._fetch_url_content)
+                stage_snapshot = service._stage_seconds.snapshot()
+                start = time.perf_counter()
+                for url in urls:
+                    fetch(url)
+                elapsed = time.perf_counter() - start
+                results[f"sequential_{parser}"] = {
+                    "wall_time_s": round(elapsed, 3),
+                    "urls_per_second": round(len(urls) / elapsed, 2) if elapsed else None,
+                    "stages": timer.summary(),
+                    "service_stages": service._stage_seconds.summary("stage", since=stage_snapshot),
+                }
+
+                start = time.perf_counter()
+                try:
+                    fetched = service.fetch_urls(urls)
+                except ImportError as e:
+                    results[f"async_{parser}"] = {"error": str(e)}
+                else:
+                    elapsed = time.perf_counter() - start
+                    results[f"async_{parser}"] = {
+                        "wall_time_s": round(elapsed, 3),
+                        "urls_per_second": round(len(urls) / elapsed, 2) if elapsed else None,
+                        "succeeded": sum(1 for content, _ in fetched.values() if content),
+                    }
+            finally:
+                service.close()
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    results["peak_rss_mb"] = _peak_rss_mb()
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="AI 요약 배치 벤치마크")
+    parser.add_argument(
+        "--dsn",
+        default=os.getenv("AI_SUMMARY_BENCH_DSN"),
+        help="벤치마크용 DB 접속 문자열 (기본: AI_SUMMARY_BENCH_DSN, 운영 DB를 가리키지 않도록 주의)",
+    )
+    parser.add_argument("--posts", type=int, default=1000, help="생성할 가짜 포스트 수")
+    parser.add_argument("--long-ratio", type=float, default=0.02, help="조각 요약이 필요한 긴 글 비율")
+    parser.add_argument("--dup-ratio", type=float, default=0.1, help="제목/본문이 같은 중복 포스트 비율")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--posts-per-request", type=int, default=1)
+    parser.add_argument("--write-batch-size", type=int, default=50)
+    parser.add_argument("--stream-rows", action="store_true")
+    parser.add_argument("--claim-mode", action="store_true")
+    parser.add_argument("--use-summary-cache", action="store_true")
+    parser.add_argument("--latency", type=float, default=0.2, help="가짜 백엔드 응답 지연(초)")
+    parser.add_argument("--latency-jitter", type=float, default=0.05)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="429 응답 비율")
+    parser.add_argument("--retry-delay", type=float, default=1.0, help="429 응답의 retry in Xs 값")
+    parser.add_argument("--fetch-urls", type=int, default=200, help="수집 벤치마크 URL 수 (0이면 생략)")
+    parser.add_argument("--fetch-concurrency", type=int, default=20)
+    parser.add_argument("--page-delay", type=float, default=0.01, help="스텁 서버 응답 지연(초)")
+    parser.add_argument("--output", help="결과 JSON 경로 (기본: benchmark-results/ai_summary_<시각>.json)")
+    args = parser.parse_args()
+    if not args.dsn:
+        parser.error("벤치마크용 DB를 --dsn 또는 AI_SUMMARY_BENCH_DSN으로 지정해야 합니다.")
+
+    _init_child_logging()
+
+    db_config = {"dsn": args.dsn}
+    _run_in_child(seed_posts, db_config, args.posts, args.long_ratio, args.dup_ratio, args.seed)
+
+    results = {
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        # 접속 문자열에는 비밀번호가 있을 수 있으므로 결과 파일에 남기지 않음
+        "args": {name: value for name, value in vars(args).items() if name != "dsn"},
+        "pipeline": _run_in_child(bench_pipeline, db_config, args),
+    }
+    if args.fetch_urls > 0:
+        results["fetch"] = _run_in_child(bench_fetch, args)
+
+    output = args.output or os.path.join("benchmark-results", f"ai_summary_{time.strftime('%Y%m%d%H%M%S')}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    print(json.dumps(results, ensure_ascii=False, indent=2))
+    print(f"결과 저장: {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,252 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+from concurrent.futures import Executor
+from typing import Dict, Iterable, Optional, Tuple
+from urllib.parse import urlsplit
+import lxml.html
+from readability import Document
+from bs4 import BeautifulSoup
+
+# aiohttp는 비동기 수집(AsyncFetcher)을 사용할 때만 필요
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+# brotli가 설치된 경우에만 br 인코딩을 요청 (urllib3/aiohttp가 br 응답을 풀려면 필요)
+try:
+    import brotli  # noqa: F401
+    ACCEPT_ENCODING = "gzip, deflate, br"
+except ImportError:
+    ACCEPT_ENCODING = "gzip, deflate"
+
+FETCH_USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+
+FETCH_HEADERS = {
+    'User-Agent': FETCH_USER_AGENT,
+    'Accept-Encoding': ACCEPT_ENCODING,
+    'Accept': 'text/html,application/xhtml+xml;q=0.9,*/*;q=0.1',
+}
+
+# 본문 추출 대상으로 인정하는 Content-Type (헤더가 없으면 HTML로 간주)
+HTML_CONTENT_TYPES = ("text/html", "application/xhtml+xml")
+
+# URL 하나당 다운로드할 최대 바이트 수 (압축 해제 후 기준)
+DEFAULT_MAX_BYTES = 2 * 1024 * 1024
+
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+
+def is_html_content_type(content_type: Optional[str]) -> bool:
+    """Content-Type 헤더가 HTML 문서인지 확인합니다."""
+    if not content_type:
+        return True
+    return content_type.split(";", 1)[0].strip().lower() in HTML_CONTENT_TYPES
+
+
+def read_capped(response, max_bytes: Optional[int]) -> bytes:
+    """stream=True로 받은 requests 응답 본문을 최대 max_bytes까지만 읽습니다."""
+    body = bytearray()
+    for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+        body.extend(chunk)
+        if max_bytes is not None and len(body) >= max_bytes:
+            del body[max_bytes:]
+            break
+    return bytes(body)
+
+
+def extract_text(html: bytes, max_chars: Optional[int] = 10000, parser: str = "lxml") -> Optional[str]:
+    """HTML에서 readability-lxml로 본문을 찾아 텍스트만 추출합니다.
+
+    parser="lxml"이면 readability가 만든 본문 HTML을 lxml(C 파서)로 읽어 텍스트 노드만 모으고,
+    parser="bs4"이면 기존처럼 BeautifulSoup의 html.parser로 다시 파싱합니다.
+
+    Returns:
+        Optional[str]: 공백을 정리한 본문 텍스트 (본문이 없으면 None)
+    """
+    # readability-lxml을 사용하여 본문 추출
+    doc = Document(html)
+    content_html = doc.summary()
+
+    # HTML에서 텍스트만 추출
+    if parser == "bs4":
+        soup = BeautifulSoup(content_html, 'html.parser')
+        content = soup.get_text(separator=' ', strip=True)
+    else:
+        if not content_html.strip():
+            return None
+        # 주석은 text() 노드가 아니므로 BeautifulSoup get_text와 같이 제외됨
+        content = ' '.join(lxml.html.fromstring(content_html).xpath('//text()'))
+
+    if not content:
+        return None
+
+    # 공백 정리 및 길이 제한 (너무 긴 경우)
+    content = ' '.join(content.split())
+    if not content:
+        return None
+    if max_chars is not None and len(content) > max_chars:
+        content = content[:max_chars] + "..."
+    return content
+
+
+class HttpCache:
+    """URL별 ETag/Last-Modified와 추출된 본문을 디스크에 저장하는 조건부 요청 캐시입니다.
+
+    다음 요청에 If-None-Match/If-Modified-Since를 보내고, 304 응답이면
+    다시 다운로드하거나 파싱하지 않고 저장된 본문을 그대로 사용합니다.
+    """
+
+    def __init__(self, cache_dir: str):
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, url: str) -> str:
+        return os.path.join(self.cache_dir, hashlib.sha256(url.encode("utf-8")).hexdigest() + ".json")
+
+    def load(self, url: str) -> Optional[dict]:
+        """저장된 캐시 항목을 반환합니다. 없거나 읽을 수 없으면 None입니다."""
+        try:
+            with open(self._path(url), encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return entry if entry.get("url") == url else None
+
+    @staticmethod
+    def conditional_headers(entry: Optional[dict]) -> Dict[str, str]:
+        """캐시 항목으로 조건부 요청 헤더를 만듭니다."""
+        headers = {}
+        if entry:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def store(self, url: str, etag: Optional[str], last_modified: Optional[str], content: str) -> None:
+        """검증자(ETag/Last-Modified)가 있는 응답만 저장합니다. 다른 프로세스가 읽는 중에도 안전하도록 교체 방식으로 씁니다."""
+        if not etag and not last_modified:
+            return
+        entry = {
+            "url": url,
+            "etag": etag,
+            "last_modified": last_modified,
+            "content": content,
+            "fetched_at": time.time(),
+        }
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(entry, f, ensure_ascii=False)
+            os.replace(tmp_path, self._path(url))
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+
+class AsyncFetcher:
+    """여러 URL의 본문을 asyncio로 동시에 가져오는 수집기입니다.
+
+    전체 동시 요청 수는 concurrency, 같은 호스트에 대한 동시 요청 수는 per_host로 제한합니다.
+    extract_executor로 ProcessPoolExecutor를 넘기면 본문 추출이 여러 코어에서 실행됩니다.
+    결과는 AISummaryBatchService._fetch_url_content와 같은 (content, status) 형식입니다.
+    """
+
+    def __init__(
+        self,
+        concurrency: int = 20,
+        per_host: int = 2,
+        connect_timeout: float = 5.0,
+        read_timeout: float = 20.0,
+        max_chars: Optional[int] = 10000,
+        extract_executor: Optional[Executor] = None,
+        extract_parser: str = "lxml",
+        http_cache: Optional[HttpCache] = None,
+        max_bytes: Optional[int] = DEFAULT_MAX_BYTES,
+    ):
+        self.logger = logging.getLogger("ai-summary-batch")
+        self.concurrency = max(1, concurrency)
+        self.per_host = max(1, per_host)
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.max_chars = max_chars
+        self.extract_executor = extract_executor
+        self.extract_parser = extract_parser
+        self.http_cache = http_cache
+        self.max_bytes = max_bytes
+        # fetch_all()로 내려받은 본문 바이트 수 (이벤트 루프 스레드에서만 갱신)
+        self.bytes_fetched = 0
+
+    async def fetch_all(self, urls: Iterable[str]) -> Dict[str, Tuple[Optional[str], Optional[int]]]:
+        """URL 목록을 동시에 수집합니다.
+
+        Returns:
+            Dict[str, Tuple[Optional[str], Optional[int]]]: URL별 (content, status)
+        """
+        if aiohttp is None:
+            raise ImportError("비동기 수집에는 aiohttp가 필요합니다. (pip install aiohttp)")
+
+        urls = list(dict.fromkeys(urls))
+        global_limit = asyncio.Semaphore(self.concurrency)
+        host_limits: Dict[str, asyncio.Semaphore] = {}
+
+        timeout = aiohttp.ClientTimeout(sock_connect=self.connect_timeout, sock_read=self.read_timeout)
+        connector = aiohttp.TCPConnector(limit=self.concurrency, limit_per_host=self.per_host)
+        async with aiohttp.ClientSession(headers=FETCH_HEADERS, timeout=timeout, connector=connector) as session:
+            async def fetch(url: str):
+                host = urlsplit(url).netloc.lower()
+                host_limit = host_limits.setdefault(host, asyncio.Semaphore(self.per_host))
+                async with global_limit, host_limit:
+                    return url, await self._fetch_one(session, url)
+
+            results = await asyncio.gather(*(fetch(url) for url in urls))
+        return dict(results)
+
+    async def _fetch_one(self, session, url: str) -> Tuple[Optional[str], Optional[int]]:
+        try:
+            cached = self.http_cache.load(url) if self.http_cache else None
+            async with session.get(url, headers=HttpCache.conditional_headers(cached)) as response:
+                # 변경되지 않은 페이지는 저장된 본문을 그대로 사용
+                if response.status == 304 and cached:
+                    return (cached["content"], None)
+                if response.status == 404:
+                    self.logger.warning(f"URL 404 에러 ({url}): 페이지를 찾을 수 없습니다.")
+                    return (None, 404)
+                if response.status >= 400:
+                    self.logger.error(f"URL HTTP 에러 ({url}): {response.status} {response.reason}")
+                    return (None, None)
+                # PDF, 동영상 등 HTML이 아닌 응답은 본문을 읽지 않음
+                content_type = response.headers.get("Content-Type")
+                if not is_html_content_type(content_type):
+                    self.logger.warning(f"HTML이 아닌 URL 건너뜀 ({url}): {content_type}")
+                    return (None, None)
+                
+                # 최대 max_bytes까지만 읽고 나머지는 버림
+                body = bytearray()
+                async for chunk in response.content.iter_chunked(DOWNLOAD_CHUNK_SIZE):
+                    body.extend(chunk)
+                    if self.max_bytes is not None and len(body) >= self.max_bytes:
+                        del body[self.max_bytes:]
+                        break
+                body = bytes(body)
+                self.bytes_fetched += len(body)
+                etag = response.headers.get("ETag")
+                last_modified = response.headers.get("Last-Modified")
+
+            # 본문 추출은 CPU 작업이므로 이벤트 루프를 막지 않도록 별도 스레드/프로세스에서 실행
+            # (응답 원본 bytes만 넘기고 정리된 텍스트만 돌려받음)
+            loop = asyncio.get_running_loop()
+            content = await loop.run_in_executor(self.extract_executor, extract_text, body, self.max_chars, self.extract_parser)
+            if content and self.http_cache:
+                self.http_cache.store(url, etag, last_modified, content)
+            return (content, None)
+        except Exception as e:
+            self.logger.error(f"URL 내용 가져오기 실패 ({url}): {str(e)[:200]}")
+            return (None, None)
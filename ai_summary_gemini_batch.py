@@ -0,0 +1,187 @@
+import json
+import logging
+import os
+import time
+from typing import Iterator, Optional, Tuple
+import requests
+
+GEMINI_API_BASE_URL = "https://generativelanguage.googleapis.com"
+
+# 배치 작업이 더 이상 진행되지 않는 상태
+BATCH_TERMINAL_STATES = {
+    "BATCH_STATE_SUCCEEDED",
+    "BATCH_STATE_FAILED",
+    "BATCH_STATE_CANCELLED",
+    "BATCH_STATE_EXPIRED",
+}
+
+# 잠시 후 다시 요청하면 성공할 수 있는 HTTP 상태 코드
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class GeminiBatchError(Exception):
+    """Gemini Batch API 작업이 실패했거나 결과를 가져올 수 없을 때 발생합니다."""
+
+
+class GeminiBatchClient:
+    """Gemini Batch API(REST) 클라이언트입니다.
+
+    JSONL 입력 파일을 Files API로 업로드하고, batchGenerateContent 작업을 만들고,
+    완료될 때까지 상태를 확인한 뒤 결과 JSONL을 한 줄씩 읽어옵니다.
+    base_url을 바꾸면 로컬 스텁 서버로 테스트할 수 있습니다.
+    상태 조회와 결과 다운로드(GET)는 연결 오류나 5xx/429 응답이면 max_retries번까지 다시 시도합니다.
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        base_url: str = GEMINI_API_BASE_URL,
+        timeout: float = 60.0,
+        max_retries: int = 5,
+        retry_backoff: float = 2.0,
+    ):
+        self.logger = logging.getLogger("ai-summary-batch")
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.session = requests.Session()
+        self.session.headers["x-goog-api-key"] = api_key
+
+    def _get(self, url: str, **kwargs) -> requests.Response:
+        """GET 요청을 보내고 일시적인 오류이면 지수 백오프로 다시 시도합니다."""
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = self.session.get(url, timeout=self.timeout, **kwargs)
+                if response.status_code not in RETRYABLE_STATUS_CODES or attempt == self.max_retries:
+                    response.raise_for_status()
+                    return response
+                error = f"HTTP {response.status_code}"
+                response.close()
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt == self.max_retries:
+                    raise
+                error = str(e)[:200]
+            delay = min(60.0, self.retry_backoff * (2 ** attempt))
+            self.logger.warning(f"배치 API 요청 실패 ({error}), {delay:.0f}초 후 다시 시도 ({attempt + 1}/{self.max_retries})")
+            time.sleep(delay)
+
+    def upload_jsonl(self, path: str, display_name: str) -> str:
+        """JSONL 파일을 resumable 업로드로 올립니다.
+
+        Returns:
+            str: 업로드된 파일 이름 (files/...)
+        """
+        size = os.path.getsize(path)
+        start = self.session.post(
+            f"{self.base_url}/upload/v1beta/files",
+            headers={
+                "X-Goog-Upload-Protocol": "resumable",
+                "X-Goog-Upload-Command": "start",
+                "X-Goog-Upload-Header-Content-Length": str(size),
+                "X-Goog-Upload-Header-Content-Type": "application/jsonl",
+            },
+            json={"file": {"display_name": display_name}},
+            timeout=self.timeout,
+        )
+        start.raise_for_status()
+        upload_url = start.headers.get("X-Goog-Upload-URL")
+        if not upload_url:
+            raise GeminiBatchError("업로드 URL을 받지 못했습니다.")
+
+        with open(path, "rb") as f:
+            uploaded = self.session.post(
+                upload_url,
+                headers={
+                    "Content-Length": str(size),
+                    "X-Goog-Upload-Offset": "0",
+                    "X-Goog-Upload-Command": "upload, finalize",
+                },
+                data=f,
+                timeout=self.timeout,
+            )
+        uploaded.raise_for_status()
+        return uploaded.json()["file"]["name"]
+
+    def create_batch(self, model_name: str, file_name: str, display_name: str) -> str:
+        """업로드한 입력 파일로 배치 작업을 만듭니다.
+
+        Returns:
+            str: 배치 작업 이름 (batches/...)
+        """
+        response = self.session.post(
+            f"{self.base_url}/v1beta/models/{model_name}:batchGenerateContent",
+            json={"batch": {"display_name": display_name, "input_config": {"file_name": file_name}}},
+            timeout=self.timeout,
+        )
+        response.raise_for_status()
+        return response.json()["name"]
+
+    def get_batch(self, batch_name: str) -> Tuple[str, Optional[str]]:
+        """배치 작업 상태를 조회합니다.
+
+        Returns:
+            Tuple[str, Optional[str]]: (상태, 결과 파일 이름)
+        """
+        batch = self._get(f"{self.base_url}/v1beta/{batch_name}").json()
+
+        # 작업(operation) 형식이면 metadata에, 아니면 최상위에 배치 정보가 있음
+        metadata = batch.get("metadata") or batch
+        state = metadata.get("state", "BATCH_STATE_UNSPECIFIED")
+        output = metadata.get("output") or batch.get("response") or {}
+        return state, output.get("responsesFile")
+
+    def wait(self, batch_name: str, poll_interval: float, timeout: float) -> str:
+        """배치 작업이 끝날 때까지 poll_interval초마다 상태를 확인합니다.
+
+        Returns:
+            str: 결과 파일 이름
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            state, responses_file = self.get_batch(batch_name)
+            if state in BATCH_TERMINAL_STATES:
+                if state != "BATCH_STATE_SUCCEEDED":
+                    raise GeminiBatchError(f"배치 작업이 완료되지 않았습니다: {batch_name} ({state})")
+                if not responses_file:
+                    raise GeminiBatchError(f"배치 작업 결과 파일이 없습니다: {batch_name}")
+                return responses_file
+
+            if time.monotonic() >= deadline:
+                raise GeminiBatchError(f"배치 작업 대기 시간 초과: {batch_name} ({state})")
+            self.logger.info(f"배치 작업 진행 중: {batch_name} ({state}), {poll_interval:.0f}초 후 다시 확인")
+            time.sleep(poll_interval)
+
+    def iter_results(self, file_name: str) -> Iterator[Tuple[str, Optional[str], Optional[str], Tuple[int, int]]]:
+        """결과 JSONL을 스트리밍으로 읽어 요청별 결과를 반환합니다.
+
+        Yields:
+            (key, text, error, usage): 성공이면 text, 실패면 error 메시지가 채워짐
+                usage는 응답 usageMetadata의 (입력 토큰, 출력 토큰)
+        """
+        with self._get(
+            f"{self.base_url}/download/v1beta/{file_name}:download",
+            params={"alt": "media"},
+            stream=True,
+        ) as download:
+            for line in download.iter_lines(decode_unicode=True):
+                if not line:
+                    continue
+                result = json.loads(line)
+                key = str(result.get("key", ""))
+                if "error" in result:
+                    yield (key, None, json.dumps(result["error"], ensure_ascii=False)[:500], (0, 0))
+                    continue
+                result_response = result.get("response") or {}
+                usage_metadata = result_response.get("usageMetadata") or {}
+                usage = (usage_metadata.get("promptTokenCount", 0), usage_metadata.get("candidatesTokenCount", 0))
+                try:
+                    parts = result_response["candidates"][0]["content"]["parts"]
+                    text = "".join(part.get("text", "") for part in parts).strip()
+                except (KeyError, IndexError, TypeError):
+                    yield (key, None, "응답에 요약이 없습니다.", usage)
+                    continue
+                yield (key, text or None, None if text else "빈 요약", usage)
+
+    def close(self) -> None:
+        self.session.close()
@@ -0,0 +1,271 @@
+import bisect
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Tuple
+import requests
+
+# 초 단위 소요 시간 히스토그램의 기본 버킷 (DB 쿼리 수 ms ~ Gemini 호출 수십 초)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _label_key(labels: dict) -> Tuple[Tuple[str, str], ...]:
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _escape_label_value(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(label_key: Tuple[Tuple[str, str], ...], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(label_key) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape_label_value(value)}"' for name, value in pairs) + "}"
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Counter:
+    """레이블별로 누적되는 카운터입니다. 여러 스레드에서 inc()를 호출해도 안전합니다."""
+
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help_text = help_text
+        self._lock = threading.Lock()
+        self._values: Dict[tuple, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        if amount < 0:
+            raise ValueError("카운터는 감소할 수 없습니다.")
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(_label_key(labels), 0.0)
+
+    def snapshot(self) -> Dict[tuple, float]:
+        """현재 값을 복사해 반환합니다. value_since()로 이후 증가분을 계산할 때 사용합니다."""
+        with self._lock:
+            return dict(self._values)
+
+    def value_since(self, snapshot: Dict[tuple, float], **labels) -> float:
+        """snapshot 이후 증가한 값을 반환합니다."""
+        key = _label_key(labels)
+        with self._lock:
+            return self._values.get(key, 0.0) - snapshot.get(key, 0.0)
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(key)} {_format_value(value)}")
+        return "\n".join(lines)
+
+
+class HistogramSnapshot:
+    """Histogram.snapshot() 시점의 레이블별 버킷 개수와 합계입니다.
+
+    스냅샷이 살아 있는 동안 이후 관측값의 최소/최대값도 함께 기록하여,
+    summary(since=...)의 분위수 추정치를 그 구간에서 실제로 관측된 범위로 제한합니다.
+    """
+
+    def __init__(self, counts: Dict[tuple, list], sums: Dict[tuple, float]):
+        self.counts = counts
+        self.sums = sums
+        self.mins: Dict[tuple, float] = {}
+        self.maxs: Dict[tuple, float] = {}
+
+
+class Histogram:
+    """레이블별 관측값 분포(버킷, 합계, 개수)를 기록하는 히스토그램입니다."""
+
+    def __init__(self, name: str, help_text: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        # 레이블별 [버킷별 개수..., +Inf 개수], 합계
+        self._counts: Dict[tuple, list] = {}
+        self._sums: Dict[tuple, float] = {}
+        # 분위수 추정치를 실제 관측 범위로 제한하기 위한 최소/최대값
+        self._mins: Dict[tuple, float] = {}
+        self._maxs: Dict[tuple, float] = {}
+        # 구간별 최소/최대값을 갱신할 스냅샷 (사용이 끝나 참조가 없어지면 자동으로 빠짐)
+        self._snapshots = weakref.WeakSet()
+
+    def observe(self, value: float, **labels) -> None:
+        key = _label_key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._counts.get(key)
+            if counts is None:
+                counts = self._counts[key] = [0] * (len(self.buckets) + 1)
+            counts[index] += 1
+            self._sums[key] = self._sums.get(key, 0.0) + value
+            self._mins[key] = min(self._mins.get(key, value), value)
+            self._maxs[key] = max(self._maxs.get(key, value), value)
+            for snapshot in self._snapshots:
+                snapshot.mins[key] = min(snapshot.mins.get(key, value), value)
+                snapshot.maxs[key] = max(snapshot.maxs.get(key, value), value)
+
+    @contextmanager
+    def time(self, **labels):
+        """with 블록의 실행 시간(초)을 기록합니다. 예외가 나도 기록합니다."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels) -> int:
+        with self._lock:
+            return sum(self._counts.get(_label_key(labels), ()))
+
+    def total(self, **labels) -> float:
+        with self._lock:
+            return self._sums.get(_label_key(labels), 0.0)
+
+    def snapshot(self) -> HistogramSnapshot:
+        """레이블별 버킷 개수와 합계를 복사해 반환합니다. summary()로 이후 관측값만 요약할 때 사용합니다."""
+        with self._lock:
+            snapshot = HistogramSnapshot(
+                {key: list(counts) for key, counts in self._counts.items()},
+                dict(self._sums),
+            )
+            self._snapshots.add(snapshot)
+            return snapshot
+
+    def _quantile(self, counts: list, q: float) -> float:
+        """버킷 개수로 분위수를 추정합니다. (Prometheus histogram_quantile처럼 버킷 안에서 선형 보간)"""
+        total = sum(counts)
+        rank = q * total
+        cumulative = 0
+        for index, bucket_count in enumerate(counts):
+            if bucket_count and cumulative + bucket_count >= rank:
+                if index >= len(self.buckets):
+                    # +Inf 버킷은 마지막 경계값으로 표시
+                    return self.buckets[-1]
+                lower = self.buckets[index - 1] if index > 0 else 0.0
+                upper = self.buckets[index]
+                return lower + (upper - lower) * (rank - cumulative) / bucket_count
+            cumulative += bucket_count
+        return 0.0
+
+    def summary(self, label: str, since: Optional[HistogramSnapshot] = None) -> Dict[str, dict]:
+        """label 값별 관측 횟수, 평균, p50/p95(ms)를 반환합니다. since를 주면 그 이후 관측값만 요약합니다.
+
+        p50/p95는 버킷 안에서 선형 보간한 추정치이며, 요약 구간의 실제 최소/최대값 범위로 제한합니다.
+        """
+        with self._lock:
+            current = {key: (list(counts), self._sums[key]) for key, counts in self._counts.items()}
+            if since is None:
+                bounds = {key: (self._mins[key], self._maxs[key]) for key in self._counts}
+            else:
+                bounds = {key: (since.mins[key], since.maxs[key]) for key in since.mins}
+        result = {}
+        for key, (counts, total) in current.items():
+            if since is not None:
+                before_counts = since.counts.get(key, [0] * len(counts))
+                counts = [now - before for now, before in zip(counts, before_counts)]
+                total -= since.sums.get(key, 0.0)
+            count = sum(counts)
+            if not count:
+                continue
+            name = dict(key).get(label, "")
+            low, high = bounds[key]
+            result[name] = {
+                "count": count,
+                "avg_ms": round(total / count * 1000, 1),
+                "p50_ms": round(min(high, max(low, self._quantile(counts, 0.5))) * 1000, 1),
+                "p95_ms": round(min(high, max(low, self._quantile(counts, 0.95))) * 1000, 1),
+            }
+        return result
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key in sorted(self._counts):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets, self._counts[key]):
+                    cumulative += bucket_count
+                    lines.append(f"{self.name}_bucket{_format_labels(key, ('le', repr(float(bound))))} {cumulative}")
+                cumulative += self._counts[key][-1]
+                lines.append(f"{self.name}_bucket{_format_labels(key, ('le', '+Inf'))} {cumulative}")
+                lines.append(f"{self.name}_sum{_format_labels(key)} {_format_value(self._sums[key])}")
+                lines.append(f"{self.name}_count{_format_labels(key)} {cumulative}")
+        return "\n".join(lines)
+
+
+class MetricsRegistry:
+    """카운터와 히스토그램을 이름별로 보관하고 Prometheus 텍스트 형식으로 내보냅니다.
+
+    start_http_server()로 /metrics 엔드포인트를 열거나, push()로 배치 종료 시 Pushgateway에 전송합니다.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics: Dict[str, object] = {}
+
+    def _get_or_create(self, name: str, metric_type: type, factory):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = factory()
+            elif not isinstance(metric, metric_type):
+                raise ValueError(f"{name}은(는) 이미 다른 종류의 메트릭으로 등록되어 있습니다.")
+            return metric
+
+    def counter(self, name: str, help_text: str = "") -> Counter:
+        return self._get_or_create(name, Counter, lambda: Counter(name, help_text))
+
+    def histogram(self, name: str, help_text: str = "", buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self._get_or_create(name, Histogram, lambda: Histogram(name, help_text, buckets))
+
+    def render(self) -> str:
+        """등록된 모든 메트릭을 Prometheus 텍스트 형식으로 반환합니다."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(metric.render() for metric in metrics) + "\n"
+
+    def start_http_server(self, port: int, addr: str = "0.0.0.0") -> ThreadingHTTPServer:
+        """GET /metrics 요청에 메트릭을 응답하는 HTTP 서버를 백그라운드 스레드로 시작합니다."""
+        registry = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?", 1)[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = registry.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", PROMETHEUS_CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((addr, port), MetricsHandler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, name="ai-summary-metrics", daemon=True).start()
+        return server
+
+    def push(self, gateway_url: str, job: str = "ai_summary_batch", timeout: float = 10.0) -> None:
+        """Prometheus Pushgateway에 현재 메트릭을 전송합니다. (같은 job의 이전 값은 교체됨)"""
+        response = requests.put(
+            f"{gateway_url.rstrip('/')}/metrics/job/{job}",
+            data=self.render().encode("utf-8"),
+            headers={"Content-Type": PROMETHEUS_CONTENT_TYPE},
+            timeout=timeout,
+        )
+        response.raise_for_status()
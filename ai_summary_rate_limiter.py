@@ -0,0 +1,155 @@
+import threading
+import time
+import logging
+from typing import Optional
+
+
+class RateLimiter:
+    """분당 요청 수(RPM)와 분당 토큰 수(TPM)를 함께 제한하는 토큰 버킷입니다.
+
+    여러 워커 스레드가 하나의 인스턴스를 공유하며, Gemini 호출 전에 acquire()로 속도를 맞춥니다.
+    429 에러가 발생하면 on_rate_limited()로 전달된 retry 지연과 할당량 정보를 사용해
+    전체 호출을 일시 중지하고, 연속된 429에는 지수적으로 대기 시간을 늘립니다.
+    stop()을 호출하면 대기 중인 acquire()가 바로 반환되므로 호출 측은 stopped를 확인하고 요청을 보내지 않아야 합니다.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: Optional[float] = None,
+        tokens_per_minute: Optional[float] = None,
+        max_backoff: float = 300.0,
+    ):
+        self.logger = logging.getLogger("ai-summary-batch")
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.max_backoff = max_backoff
+
+        self._lock = threading.Lock()
+        now = time.monotonic()
+        self._request_tokens = float(requests_per_minute or 0)
+        self._token_tokens = float(tokens_per_minute or 0)
+        self._last_refill = now
+        self._paused_until = now
+        self._consecutive_429 = 0
+        self._stop_event = threading.Event()
+
+        # 일일 할당량(PerDay) 초과는 이번 실행 안에서 회복되지 않음
+        self.daily_quota_exhausted = False
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._last_refill
+        self._last_refill = now
+        if self.requests_per_minute:
+            self._request_tokens = min(
+                float(self.requests_per_minute),
+                self._request_tokens + elapsed * self.requests_per_minute / 60.0,
+            )
+        if self.tokens_per_minute:
+            self._token_tokens = min(
+                float(self.tokens_per_minute),
+                self._token_tokens + elapsed * self.tokens_per_minute / 60.0,
+            )
+
+    def acquire(self, tokens: int = 0) -> float:
+        """요청 1건과 tokens개의 토큰을 사용할 수 있을 때까지 대기합니다.
+
+        stop()이 호출되면 토큰을 사용하지 않고 바로 반환합니다.
+
+        Returns:
+            float: 대기한 시간(초)
+        """
+        waited = 0.0
+        while True:
+            if self._stop_event.is_set():
+                return waited
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+
+                wait = max(0.0, self._paused_until - now)
+                if self.requests_per_minute and self._request_tokens < 1:
+                    wait = max(wait, (1 - self._request_tokens) * 60.0 / self.requests_per_minute)
+                if self.tokens_per_minute:
+                    # 버킷 용량보다 큰 요청은 가득 찬 버킷 하나로 취급
+                    needed = min(float(tokens), float(self.tokens_per_minute))
+                    if self._token_tokens < needed:
+                        wait = max(wait, (needed - self._token_tokens) * 60.0 / self.tokens_per_minute)
+
+                if wait <= 0:
+                    if self.requests_per_minute:
+                        self._request_tokens -= 1
+                    if self.tokens_per_minute:
+                        self._token_tokens -= min(float(tokens), float(self.tokens_per_minute))
+                    return waited
+
+            # stop()이 호출되면 429 백오프(최대 max_backoff초) 중이어도 바로 깨어남
+            if self._stop_event.wait(wait):
+                return waited
+            waited += wait
+
+    def reset_run_state(self) -> None:
+        """실행마다 새로 판단해야 하는 상태(일일 할당량 초과)를 초기화합니다.
+
+        run_daemon()처럼 한 인스턴스로 여러 번 실행할 때, 이전 실행의 일일 할당량 초과로
+        이후의 분당 429까지 재시도 없이 할당량 초과로 처리되지 않도록 run() 시작 시 호출합니다.
+        요청 속도 제한과 429 백오프 상태는 실행 사이에도 유지합니다.
+        """
+        with self._lock:
+            self.daily_quota_exhausted = False
+
+    def stop(self) -> None:
+        """대기 중인 acquire()를 깨우고 이후의 acquire()는 기다리지 않고 반환하게 합니다."""
+        self._stop_event.set()
+
+    @property
+    def stopped(self) -> bool:
+        return self._stop_event.is_set()
+
+    def on_success(self) -> None:
+        """요청이 성공하면 연속 429 카운트를 초기화합니다."""
+        with self._lock:
+            self._consecutive_429 = 0
+
+    def on_rate_limited(
+        self,
+        retry_delay: float,
+        quota_metric: Optional[str] = None,
+        quota_value: Optional[str] = None,
+        quota_id: Optional[str] = None,
+    ) -> float:
+        """429 에러 정보를 반영하여 모든 호출을 일시 중지합니다.
+
+        Returns:
+            float: 적용된 대기 시간(초)
+        """
+        quota_name = f"{quota_metric or ''} {quota_id or ''}".lower()
+
+        with self._lock:
+            self._consecutive_429 += 1
+            backoff = min(self.max_backoff, retry_delay * (2 ** (self._consecutive_429 - 1)))
+            backoff = max(backoff, retry_delay)
+
+            now = time.monotonic()
+            self._refill(now)
+            self._paused_until = max(self._paused_until, now + backoff)
+
+            if "perday" in quota_name or "per_day" in quota_name:
+                self.daily_quota_exhausted = True
+
+            # 분당 할당량 정보가 있으면 버킷 크기를 실제 할당량에 맞추고 비움
+            elif quota_value and quota_value.isdigit():
+                limit = float(quota_value)
+                if "token" in quota_name:
+                    if not self.tokens_per_minute or limit < self.tokens_per_minute:
+                        self.tokens_per_minute = limit
+                    self._token_tokens = 0.0
+                else:
+                    if not self.requests_per_minute or limit < self.requests_per_minute:
+                        self.requests_per_minute = limit
+                    self._request_tokens = 0.0
+
+            self.logger.info(
+                f"요청 속도 제한 적용: {backoff:.1f}초 대기 (연속 429: {self._consecutive_429}회, "
+                f"RPM: {self.requests_per_minute}, TPM: {self.tokens_per_minute})"
+            )
+            return backoff
@@ -0,0 +1,281 @@
+"""GeminiBatchClient와 run_offline_batch()를 로컬 스텁 Batch API 서버로 확인하는 테스트
+
+GeminiBatchClient 테스트는 DB 없이 실행됩니다.
+run_offline_batch()의 DB 왕복 확인은 AI_SUMMARY_TEST_DSN에 테스트용 DB를 지정한 경우에만 실행합니다.
+"""
+import json
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+import requests
+from ai_summary_gemini_batch import GeminiBatchClient, GeminiBatchError
+
+TEST_SCHEMA = "ai_summary_test"
+
+
+def _succeeded(responses_file: str = "files/output-1") -> tuple:
+    return (200, {"metadata": {"state": "BATCH_STATE_SUCCEEDED", "output": {"responsesFile": responses_file}}, "done": True})
+
+
+def _state(state: str) -> tuple:
+    return (200, {"metadata": {"state": state}})
+
+
+def _result_line(key: str, text: str, prompt_tokens: int = 100, output_tokens: int = 20) -> dict:
+    return {
+        "key": key,
+        "response": {
+            "candidates": [{"content": {"parts": [{"text": text}]}}],
+            "usageMetadata": {"promptTokenCount": prompt_tokens, "candidatesTokenCount": output_tokens},
+        },
+    }
+
+
+class _StubBatchHandler(BaseHTTPRequestHandler):
+    """Gemini Batch API의 업로드/작업 생성/상태 조회/결과 다운로드를 흉내 내는 스텁 서버 핸들러입니다.
+
+    상태 조회는 server.batch_states를 앞에서부터 하나씩 응답하고 마지막 항목은 계속 반복합니다.
+    결과 다운로드는 server.result_lines가 있으면 그대로, 없으면 업로드된 요청마다 성공 결과를 만들어 응답합니다.
+    server.download_errors만큼은 다운로드에 503을 응답합니다. 받은 요청은 server 속성에 기록합니다.
+    """
+
+    protocol_version = "HTTP/1.1"
+
+    def _send(self, status: int, body: bytes, content_type: str = "application/json", headers: dict = None):
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_json(self, status: int, payload: dict, headers: dict = None):
+        self._send(status, json.dumps(payload).encode("utf-8"), headers=headers)
+
+    def do_POST(self):
+        server = self.server
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        if self.path == "/upload/v1beta/files":
+            server.upload_start = {"headers": dict(self.headers), "body": json.loads(body)}
+            headers = {"X-Goog-Upload-URL": f"{server.base_url}/upload-session/1"} if server.give_upload_url else {}
+            self._send_json(200, {}, headers)
+        elif self.path == "/upload-session/1":
+            server.uploaded = body
+            self._send_json(200, {"file": {"name": "files/input-1"}})
+        elif self.path.endswith(":batchGenerateContent"):
+            server.create_path = self.path
+            server.create_body = json.loads(body)
+            self._send_json(200, {"name": "batches/1"})
+        else:
+            self._send_json(404, {"error": {"code": 404}})
+
+    def do_GET(self):
+        server = self.server
+        if self.path == "/v1beta/batches/1":
+            server.batch_polls += 1
+            status, payload = server.batch_states[min(server.batch_polls, len(server.batch_states)) - 1]
+            self._send_json(status, payload)
+        elif self.path == "/download/v1beta/files/output-1:download?alt=media":
+            server.downloads += 1
+            if server.downloads <= server.download_errors:
+                self._send_json(503, {"error": {"code": 503}})
+                return
+            lines = server.result_lines
+            if lines is None:
+                requests_ = [json.loads(line) for line in server.uploaded.decode("utf-8").splitlines() if line]
+                # 첫 번째 요청은 실패로 응답
+                lines = [{"key": requests_[0]["key"], "error": {"code": 400, "message": "invalid request"}}]
+                lines += [_result_line(request["key"], f"요약 {request['key']}") for request in requests_[1:]]
+            body = "".join(line if isinstance(line, str) else json.dumps(line, ensure_ascii=False) + "\n" for line in lines)
+            self._send(200, body.encode("utf-8"), "application/jsonl")
+        else:
+            self._send_json(404, {"error": {"code": 404}})
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def stub_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _StubBatchHandler)
+    server.daemon_threads = True
+    server.base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    server.give_upload_url = True
+    server.upload_start = None
+    server.uploaded = None
+    server.create_path = None
+    server.create_body = None
+    server.batch_states = [_succeeded()]
+    server.batch_polls = 0
+    server.result_lines = None
+    server.download_errors = 0
+    server.downloads = 0
+    threading.Thread(target=server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def client(stub_server):
+    client = GeminiBatchClient("test-key", stub_server.base_url, timeout=5.0, max_retries=2, retry_backoff=0.0)
+    yield client
+    client.close()
+
+
+def test_upload_and_create_batch(stub_server, client, tmp_path):
+    path = tmp_path / "input.jsonl"
+    path.write_text('{"key": "1", "request": {}}\n', encoding="utf-8")
+
+    file_name = client.upload_jsonl(str(path), "ai-summary-test")
+    batch_name = client.create_batch("gemini-flash-latest", file_name, "ai-summary-test")
+
+    assert file_name == "files/input-1"
+    assert stub_server.upload_start["headers"]["X-Goog-Upload-Command"] == "start"
+    assert stub_server.upload_start["headers"]["x-goog-api-key"] == "test-key"
+    assert stub_server.upload_start["body"] == {"file": {"display_name": "ai-summary-test"}}
+    assert stub_server.uploaded == path.read_bytes()
+    assert batch_name == "batches/1"
+    assert stub_server.create_path == "/v1beta/models/gemini-flash-latest:batchGenerateContent"
+    assert stub_server.create_body == {
+        "batch": {"display_name": "ai-summary-test", "input_config": {"file_name": "files/input-1"}},
+    }
+
+
+def test_upload_without_upload_url_raises(stub_server, client, tmp_path):
+    stub_server.give_upload_url = False
+    path = tmp_path / "input.jsonl"
+    path.write_text("{}\n", encoding="utf-8")
+
+    with pytest.raises(GeminiBatchError):
+        client.upload_jsonl(str(path), "ai-summary-test")
+
+
+def test_wait_retries_transient_errors(stub_server, client):
+    stub_server.batch_states = [(503, {"error": {"code": 503}}), _state("BATCH_STATE_RUNNING"), _succeeded()]
+
+    assert client.wait("batches/1", poll_interval=0.0, timeout=10.0) == "files/output-1"
+    assert stub_server.batch_polls == 3
+
+
+def test_get_batch_gives_up_after_max_retries(stub_server, client):
+    stub_server.batch_states = [(503, {"error": {"code": 503}})]
+
+    with pytest.raises(requests.HTTPError):
+        client.get_batch("batches/1")
+    assert stub_server.batch_polls == client.max_retries + 1
+
+
+def test_get_batch_does_not_retry_client_errors(stub_server, client):
+    stub_server.batch_states = [(404, {"error": {"code": 404}}), _succeeded()]
+
+    with pytest.raises(requests.HTTPError):
+        client.get_batch("batches/1")
+    assert stub_server.batch_polls == 1
+
+
+def test_get_batch_reads_top_level_batch(stub_server, client):
+    stub_server.batch_states = [(200, {"state": "BATCH_STATE_SUCCEEDED", "output": {"responsesFile": "files/output-2"}})]
+
+    assert client.get_batch("batches/1") == ("BATCH_STATE_SUCCEEDED", "files/output-2")
+
+
+@pytest.mark.parametrize("state", ["BATCH_STATE_FAILED", "BATCH_STATE_CANCELLED", "BATCH_STATE_EXPIRED"])
+def test_wait_raises_on_unsuccessful_state(stub_server, client, state):
+    stub_server.batch_states = [_state(state)]
+
+    with pytest.raises(GeminiBatchError, match=state):
+        client.wait("batches/1", poll_interval=0.0, timeout=10.0)
+
+
+def test_wait_raises_without_responses_file(stub_server, client):
+    stub_server.batch_states = [_state("BATCH_STATE_SUCCEEDED")]
+
+    with pytest.raises(GeminiBatchError):
+        client.wait("batches/1", poll_interval=0.0, timeout=10.0)
+
+
+def test_wait_times_out(stub_server, client):
+    stub_server.batch_states = [_state("BATCH_STATE_RUNNING")]
+
+    with pytest.raises(GeminiBatchError, match="대기 시간 초과"):
+        client.wait("batches/1", poll_interval=0.0, timeout=0.0)
+
+
+def test_iter_results_parses_lines(stub_server, client):
+    stub_server.download_errors = 1
+    stub_server.result_lines = [
+        _result_line("1", " 첫 번째 요약 ", prompt_tokens=120, output_tokens=30),
+        "\n",
+        {"key": "2", "error": {"code": 400, "message": "invalid request"}},
+        {"key": "3", "response": {"usageMetadata": {"promptTokenCount": 50}}},
+        _result_line("4", "   "),
+        {"key": 5, "response": {"candidates": [{"content": {"parts": [{"text": "다섯"}, {"text": "번째"}]}}]}},
+    ]
+
+    results = list(client.iter_results("files/output-1"))
+
+    assert stub_server.downloads == 2
+    assert results[0] == ("1", "첫 번째 요약", None, (120, 30))
+    key, text, error, usage = results[1]
+    assert (key, text, usage) == ("2", None, (0, 0))
+    assert json.loads(error) == {"code": 400, "message": "invalid request"}
+    assert results[2] == ("3", None, "응답에 요약이 없습니다.", (50, 0))
+    assert results[3] == ("4", None, "빈 요약", (100, 20))
+    assert results[4] == ("5", "다섯번째", None, (0, 0))
+    assert len(results) == 5
+
+
+def test_run_offline_batch_round_trip(stub_server):
+    """스텁 서버로 run_offline_batch()를 실행해 결과 반영과 임대 해제를 확인합니다. (테스트용 DB 필요)"""
+    dsn = os.getenv("AI_SUMMARY_TEST_DSN")
+    if not dsn:
+        pytest.skip("AI_SUMMARY_TEST_DSN이 설정되지 않았습니다.")
+    psycopg2 = pytest.importorskip("psycopg2")
+    from ai_summary_backend import FakeBackend
+    from ai_summary_batch_service import AISummaryBatchService
+
+    db_config = {"dsn": dsn, "options": f"-c search_path={TEST_SCHEMA}"}
+    conn = psycopg2.connect(**db_config)
+    try:
+        cur = conn.cursor()
+        cur.execute(f"""
+            CREATE SCHEMA IF NOT EXISTS {TEST_SCHEMA};
+            DROP TABLE IF EXISTS {TEST_SCHEMA}.posts, {TEST_SCHEMA}.batch_logs;
+            CREATE TABLE {TEST_SCHEMA}.posts (post_id BIGSERIAL PRIMARY KEY, title TEXT, content TEXT, summary TEXT);
+            CREATE TABLE {TEST_SCHEMA}.batch_logs (
+                id BIGSERIAL PRIMARY KEY, job_type TEXT, log_level TEXT, status TEXT,
+                affected_count INTEGER, detail JSONB, error_message TEXT, created_at TIMESTAMPTZ DEFAULT now()
+            );
+        """)
+        posts = [(f"포스트 {i}", f"본문 {i} " * 20) for i in range(10)] + [("긴 글", "긴 문장입니다. " * 5000)]
+        cur.executemany("INSERT INTO posts (title, content) VALUES (%s, %s)", posts)
+        conn.commit()
+
+        stub_server.batch_states = [(503, {"error": {"code": 503}}), _state("BATCH_STATE_RUNNING"), _succeeded()]
+        service = AISummaryBatchService(
+            db_config, "test-key", backend=FakeBackend(), batch_api_base_url=stub_server.base_url, batch_poll_interval=0.0,
+        )
+        try:
+            service.run_offline_batch()
+        finally:
+            service.close()
+
+        cur.execute("SELECT count(*) FROM posts WHERE summary IS NOT NULL")
+        summarized = cur.fetchone()[0]
+        cur.execute("SELECT count(*) FROM posts WHERE summary IS NULL AND summary_claimed_by IS NOT NULL")
+        still_claimed = cur.fetchone()[0]
+        cur.execute("SELECT status FROM batch_logs ORDER BY id DESC LIMIT 1")
+        status = cur.fetchone()[0]
+        conn.commit()
+    finally:
+        conn.close()
+
+    # 긴 글은 제외하고 제출하며, 첫 번째 요청은 스텁 서버가 실패로 응답
+    assert len(stub_server.uploaded.decode("utf-8").splitlines()) == 10
+    assert stub_server.batch_polls == 3
+    assert summarized == 9
+    assert still_claimed == 0
+    assert status == "SUCCESS"